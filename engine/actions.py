@@ -4,17 +4,23 @@
 from typing import Any, Iterator, List, Optional, Tuple, Type
 import logging
 
+import numpy as np
 import tcod
 
 import engine.actor
 import engine.animation
 import engine.effects
+import engine.features
+import engine.spells
 import engine.states
 import engine.tiles
 import g
 
 logger = logging.getLogger(__name__)
 
+DIRECTIONS = [(1, 1), (-1, 1), (-1, -1), (1, -1), (1, 0), (-1, 0), (0, 1), (0, -1)]
+"All directions an actor can move in."
+
 
 class StopAction(Exception):
     """Cancels out of an action."""
@@ -33,12 +39,9 @@ def distance_to(self, other: engine.actor.Actor) -> int:
 
     def get_targets(self) -> Iterator[engine.actor.Actor]:
         """Ither over the enemies in my actors FOV."""
-        my_fov = self.actor.get_fov()
-        for other in g.world.map.actors:
+        for other in g.world.map.actors_in(self.actor.get_fov()):
             if other.faction == self.actor.faction:
                 continue
-            if not my_fov[other.xy]:
-                continue
             yield other
 
     def perform(self) -> bool:
@@ -117,7 +120,7 @@ def perform(self) -> bool:
         if blocker:
             return False
         # Perform the move.
-        self.actor.x, self.actor.y = xy
+        g.world.map.move_actor(self.actor, *xy)
         return True
 
 
@@ -138,13 +141,16 @@ def perform(self) -> bool:
 
 class Beam(ActionWithDir, ActionWithEffect):
     def perform(self) -> bool:
-        """Trace a line and apply effects along it until a wall is hit."""
+        """Trace a line until a wall is hit, then apply the effect along the whole line at once."""
+        line: List[Tuple[int, int]] = []
         for xy in self.trace_line():
-            if not g.world.map.tiles[xy]["transparent"]:
+            if not g.world.map.get_field("transparent", xy):
                 break  # Hit wall.
             if g.world.player.get_fov()[xy]:
                 engine.animation.Animation(layers=[engine.rendering.Sprite(*xy, ord("*"), (255, 255, 255))]).show()
-            self.effect.apply(*xy)
+            line.append(xy)
+        if line:
+            self.effect.apply_area(tuple(np.transpose(line)), self.actor)
         return True
 
 
@@ -153,28 +159,22 @@ def __init__(self, actor: engine.actor.Actor, range: int, **kargs: Any):
         self.range = range
         super().__init__(actor=actor, **kargs)  # type: ignore
 
-    def trace_range(self, with_center: bool, center: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, int]]:
+    def get_area(self, with_center: bool, center: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the coordinate arrays of the tiles in range of `center`, clipped to the map bounds."""
         if center is None:
             center = (self.actor.x, self.actor.y)
-        for y in range(center[1] - self.range, center[1] + self.range + 1):
-            for x in range(center[0] - self.range, center[0] + self.range + 1):
-                if not with_center and x == center[0] and y == center[1]:
-                    continue
-                if not g.world.map.in_bounds(x, y):
-                    continue
-                yield x, y
+        return g.world.map.get_area(*center, self.range, with_center=with_center)
 
 
 class Blast(ActionWithEffect, WithRange):
     def perform(self) -> bool:
-        """Trace the area around the actor and apply the effect."""
-        layers = []
-        for xy in self.trace_range(with_center=False):
-            if g.world.player.get_fov()[xy]:
-                layers.append(engine.rendering.Sprite(*xy, ord("*"), (255, 255, 255)))
-            self.effect.apply(*xy)
-        if layers:
-            engine.animation.Animation(layers, sleep_time=1 / 5).show()
+        """Apply the effect to the area around the actor."""
+        area = self.get_area(with_center=False)
+        visible = g.world.player.get_fov()[area]
+        if visible.any():
+            sprites = engine.rendering.SpriteBatch(area[0][visible], area[1][visible], ord("*"), (255, 255, 255))
+            g.world.events.add_layers([sprites])
+        self.effect.apply_area(area, self.actor)  # Shows the layers along with any chain reactions.
         return True
 
 
@@ -182,7 +182,7 @@ class RandomStep(Action):
     """Move in a random direction."""
 
     def perform(self) -> bool:
-        direction = g.world.rng.choice([(1, 1), (-1, 1), (-1, -1), (1, -1), (1, 0), (-1, 0), (0, 1), (0, -1)])
+        direction = g.world.rng.choice(DIRECTIONS)
         return engine.actions.MoveAction(self.actor, direction).perform()
 
 
@@ -190,9 +190,9 @@ class Pathfind(Action):
     """Pathfind to `dest_xy`, this will go one step in that direction per performance."""
 
     def __init__(self, actor: engine.actor.Actor, dest_xy: Tuple[int, int]):
-        cost = g.world.map.tiles["move_cost"].copy()
-        for other in g.world.map.actors:
-            cost[other.x, other.y] += 10  # Add some actor avoidance.
+        cost = actor.get_move_cost()
+        # Add some actor avoidance, without making blocked tiles passable or writing to the shared cost layer.
+        cost = np.where((g.world.map.occupancy != 0) & (cost != 0), cost + 10, cost)
         pathfinder = tcod.path.Pathfinder(tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3))
         pathfinder.add_root((actor.x, actor.y))
         self.path: List[Tuple[int, int]] = pathfinder.path_from(dest_xy)[:-1].tolist()
@@ -242,17 +242,55 @@ def perform(self) -> bool:
         return self.patrol.perform()
 
 
+class Descend(Action):
+    """Take one step down a distance map, such as the ones made by `tcod.path.dijkstra2d`.
+
+    Occupied tiles are stepped around, unless they're a destination of the distance map, which are bumped into.
+    """
+
+    def __init__(self, actor: engine.actor.Actor, distance: np.ndarray):
+        self.distance = distance
+        super().__init__(actor)
+
+    def perform(self) -> bool:
+        map_ = g.world.map
+        best_distance = self.distance[self.actor.xy]
+        best_direction: Optional[Tuple[int, int]] = None
+        for direction in DIRECTIONS:
+            x, y = self.actor.x + direction[0], self.actor.y + direction[1]
+            if not map_.in_bounds(x, y) or self.distance[x, y] >= best_distance:
+                continue
+            blocker = map_.is_blocked(x, y, self.actor)
+            if blocker and not (isinstance(blocker, engine.actor.Actor) and self.distance[x, y] == 0):
+                continue
+            best_distance = self.distance[x, y]
+            best_direction = direction
+        if best_direction is None:
+            return False
+        return MoveAction(self.actor, best_direction).perform()
+
+
 class SeekEnemy(Action):
+    """Chase the nearest visible enemy, then go to where it was last seen once it's out of view.
+
+    Visible enemies are chased using a distance map which is shared between all seekers chasing the same target.
+    """
+
     def __init__(self, actor: engine.actor.Actor):
         self.pathfinder: Optional[Pathfind] = None
+        self.last_seen: Optional[Tuple[int, int]] = None
         super().__init__(actor)
 
     def perform(self) -> bool:
         targets = list(self.get_targets())
         if targets:
-            best = min(targets, key=self.distance_to)
-            self.pathfinder = Pathfind(self.actor, best.xy)
+            self.pathfinder = None
+            self.last_seen = min(targets, key=self.distance_to).xy
+            return Descend(self.actor, g.world.map.get_seek_field(self.actor, self.last_seen)).perform()
 
+        if self.last_seen:
+            self.pathfinder = Pathfind(self.actor, self.last_seen)
+            self.last_seen = None
         if self.pathfinder and self.pathfinder.perform():
             return True
         self.pathfinder = None
@@ -274,13 +312,12 @@ class Ball(ActionWithEffect, WithRange, WithTarget):
     """Apply an effect in an explostion over a point."""
 
     def perform(self) -> bool:
-        layers = []
-        for x, y in self.trace_range(with_center=True, center=self.target_xy):
-            if g.world.player.get_fov()[x, y]:
-                layers.append(engine.rendering.Sprite(x, y, ord("*"), (255, 255, 255)))
-            self.effect.apply(x, y)
-        if layers:
-            engine.animation.Animation(layers=layers, sleep_time=1 / 5).show()
+        area = self.get_area(with_center=True, center=self.target_xy)
+        visible = g.world.player.get_fov()[area]
+        if visible.any():
+            sprites = engine.rendering.SpriteBatch(area[0][visible], area[1][visible], ord("*"), (255, 255, 255))
+            g.world.events.add_layers([sprites])
+        self.effect.apply_area(area, self.actor)  # Shows the layers along with any chain reactions.
         return True
 
 
@@ -299,22 +336,9 @@ class Explore(Action):
     """Move towards unexplored areas."""
 
     def perform(self) -> bool:
-        cost = self.actor.get_move_cost()
-        for other in g.world.map.actors:  # Move around actors.
-            cost[other.xy] = 0
-        cost[self.actor.xy] = 0
-        cost[g.world.map.tiles["dangerous"]] = 0  # Avoid acid tiles.
-        distance = tcod.path.maxarray(cost.shape, order="F")
-        unexpored = ~g.world.map.explored
-        distance[unexpored] = 0
-        cost[unexpored] = 1
-        tcod.path.dijkstra2d(distance, cost, cardinal=2, diagonal=3)
-        path = tcod.path.hillclimb2d(distance, self.actor.xy, cardinal=True, diagonal=True)[1:]
-        if not len(path):
+        if not Descend(self.actor, g.world.map.get_explore_field(self.actor)).perform():
             raise StopAction("No more areas to explore.")
-        x, y = path[0].tolist()
-        x, y = x - self.actor.x, y - self.actor.y
-        return MoveAction(self.actor, direction=(x, y)).perform()
+        return True
 
 
 class AutoExplore(Action):
@@ -322,13 +346,89 @@ def perform(self) -> bool:
         if self.actor is g.world.player:
             g.world.map.camera = engine.map.Camera(*self.actor.xy)
             engine.animation.Animation().show()
-        fov = self.actor.get_fov(plus_shared=False)
-        for other in g.world.map.actors:
+        for other in g.world.map.actors_in(self.actor.get_fov(plus_shared=False)):
             if other.faction == self.actor.faction:
                 continue
-            if not fov[other.xy]:
-                continue
             raise StopAction(f"You see a {other.name} nearby!")
         if engine.animation.events_in_queue():
             raise StopAction("Auto-explore interrupted.")
         return Explore(self.actor).perform()
+
+
+class AutoPlay(Action):
+    """A simple automated player, used to control the player when there is no display.
+
+    Steps off dangerous tiles, then casts ready spells at the nearest visible enemy, otherwise explores the level and
+    then takes the stairs down.  The game ends as `World.stuck` once there is nowhere left to go.
+    """
+
+    def perform(self) -> bool:
+        if self.escape_danger() or self.attack():
+            return True
+        try:
+            return Explore(self.actor).perform()
+        except StopAction:
+            pass
+        return self.go_downstairs()
+
+    def get_distance(self, goals: np.ndarray, avoid_danger: bool) -> np.ndarray:
+        """Return a distance map towards the `goals` mask, going around dangerous tiles if `avoid_danger` is True."""
+        map_ = g.world.map
+        cost = self.actor.get_move_cost()
+        if avoid_danger:
+            cost = np.where(map_.get_field("dangerous"), 0, cost)
+        distance: np.ndarray = tcod.path.maxarray((map_.width, map_.height), order="F")
+        distance[goals] = 0
+        tcod.path.dijkstra2d(distance, cost, cardinal=2, diagonal=3)
+        return distance
+
+    def can_reach(self, distance: np.ndarray) -> bool:
+        """Return True if any goal of the distance map `distance` can be reached from next to this actor."""
+        return bool(distance[g.world.map.get_area(*self.actor.xy, 1)].min() < np.iinfo(distance.dtype).max)
+
+    def escape_danger(self) -> bool:
+        """Step towards the nearest safe tile if standing on a dangerous tile.  Returns False if already safe."""
+        map_ = g.world.map
+        if not map_.get_field("dangerous", self.actor.xy):
+            return False
+        safe = (self.actor.get_move_cost() != 0) & ~map_.get_field("dangerous")
+        return Descend(self.actor, self.get_distance(safe, avoid_danger=False)).perform()
+
+    def attack(self) -> bool:
+        """Cast a spell at the nearest visible enemy.  Returns False if no ready spell can reach it."""
+        targets = list(self.get_targets())
+        if not targets:
+            return False
+        nearest = min(targets, key=self.distance_to)
+        dx, dy = nearest.x - self.actor.x, nearest.y - self.actor.y
+        for spell in g.world.spell_slots:
+            if spell is None or spell.cooldown_left:
+                continue
+            if isinstance(spell, engine.spells.Blast) and max(abs(dx), abs(dy)) <= spell.range:
+                return g.world.cast_spell(spell)
+            if isinstance(spell, engine.spells.Beam) and (dx == 0 or dy == 0 or abs(dx) == abs(dy)):
+                return g.world.cast_spell(spell, direction=((dx > 0) - (dx < 0), (dy > 0) - (dy < 0)))
+        return False
+
+    def go_downstairs(self) -> bool:
+        """Walk around dangerous tiles to explored stairs and go down them.
+
+        If something is in the way then this waits for it to move.  If neither the stairs nor any unexplored tiles can
+        be reached then the game is over.
+        """
+        map_ = g.world.map
+        stairs = np.zeros((map_.width, map_.height), dtype=bool, order="F")
+        for feature in map_.features:
+            if not isinstance(feature, engine.features.StairsDown) or not map_.explored[feature.x, feature.y]:
+                continue
+            if (feature.x, feature.y) == self.actor.xy:
+                g.world.descend()
+                return True
+            stairs[feature.x, feature.y] = True
+        distance = self.get_distance(stairs, avoid_danger=True)
+        if Descend(self.actor, distance).perform():
+            return True
+        if not self.can_reach(distance) and not self.can_reach(map_.get_explore_field(self.actor)):
+            g.world.report("There is nowhere left to go.")
+            g.world.stuck = True
+        return True
@@ -1,7 +1,7 @@
 """Actor class module"""
 from __future__ import annotations
 
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 import logging
 
 import numpy as np
@@ -44,6 +44,8 @@ def __init__(
         if faction is not None:
             self.faction = faction
         self.status: Dict[str, int] = {}  # Status effects: Dict[status_name: time_left]
+        self.fov_cache: Optional[Tuple[Tuple[Any, ...], int, np.ndarray]] = None  # (cache_key, map_revision, fov)
+        self.plus_shared_cache: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None  # (fov, shared, combined)
 
     def default_ai(self) -> engine.actions.Action:
         """Return the action that this actor should perform."""
@@ -64,17 +66,22 @@ def on_end_turn(self) -> None:
                 del self.status[name]
                 g.world.report(f"{name.title()} has worn off.")
         # Apply tile to the actor.
-        tile_effect: Optional[engine.effects.Effect] = g.world.map.tiles["effect"][self.xy]
+        tile_effect: Optional[engine.effects.Effect] = g.world.map.get_field("effect", self.xy)
         if tile_effect:
             tile_effect.apply(*self.xy)
 
-    def apply_effect(self, effect: engine.effects.Effect) -> None:
-        """Take damage or trigger side-effects."""
+    def apply_effect(self, effect: engine.effects.Effect, source: Optional[Actor] = None) -> None:
+        """Take damage or trigger side-effects.
+
+        `source` is the actor responsible for `effect`, or None if it came from the tile this actor is on.
+        """
         damage = effect.power  # Placeholder.
         g.world.report(f"{self.name.title()} takes {damage} damage.", visual_xy=self.xy)
         self.hp -= damage
         if self.hp <= 0:
             g.world.report(f"{self.name.title()} dies.", visual_xy=self.xy)
+            if self is g.world.player:
+                g.world.killed_by = source.name if source is not None else f"{effect.name} tile"
             g.world.map.remove_actor(self)
 
     @property
@@ -85,43 +92,72 @@ def xy(self) -> Tuple[int, int]:
     def get_fov(self, plus_shared: bool = True) -> np.ndarray:
         """Return a bool array of tiles this actor can see.
 
+        The returned array may be cached and is read-only.
+
         If `plus_shared` is True then shared vision is also added.  This parameter is used to prevent infinite
         recursion.
         """
-        visible = tcod.map.compute_fov(
-            transparency=g.world.map.tiles["transparent"],
-            pov=self.xy,
+        map_ = g.world.map
+        cache_key = (map_, self.xy, self.view_radius, "earth vision" in self.status)
+        fov_cache = self.fov_cache
+        if (
+            fov_cache is None
+            or fov_cache[0] != cache_key
+            or map_.has_changed(fov_cache[1], "tiles", self.get_fov_window())
+        ):
+            fov_cache = self.fov_cache = cache_key, map_.revision, self.compute_fov()
+        elif fov_cache[1] != map_.revision:
+            fov_cache = self.fov_cache = cache_key, map_.revision, fov_cache[2]  # Nothing in view has changed.
+        visible = fov_cache[2]
+        if not plus_shared:
+            return visible
+        shared = map_.get_shared_fov(self.faction)
+        if shared is None:
+            return visible
+        if self.share_vision and self in map_.actors:
+            return shared  # This actors own FOV is already part of the shared FOV.
+        cached = self.plus_shared_cache
+        if cached is None or cached[0] is not visible or cached[1] is not shared:
+            combined = visible | shared
+            combined.flags.writeable = False
+            cached = self.plus_shared_cache = visible, shared, combined
+        return cached[2]
+
+    def get_fov_window(self) -> Tuple[slice, slice]:
+        """Return the area of the map which can affect this actors FOV, as a pair of slices."""
+        left = max(0, self.x - self.view_radius)
+        top = max(0, self.y - self.view_radius)
+        return np.s_[left : self.x + self.view_radius + 1, top : self.y + self.view_radius + 1]
+
+    def compute_fov(self) -> np.ndarray:
+        """Compute and return the read-only FOV of this actor without any shared vision.
+
+        Only the area within `view_radius` of this actor is computed, so the cost of this does not grow with the map.
+        """
+        window = self.get_fov_window()
+        left, top = window[0].start, window[1].start
+        transparency = g.world.map.get_field("transparent", window)
+        pov = self.x - left, self.y - top
+        visible = np.zeros(g.world.map.tiles.shape, dtype=bool, order="F")
+        visible[window] = tcod.map.compute_fov(
+            transparency=transparency,
+            pov=pov,
             algorithm=tcod.FOV_SYMMETRIC_SHADOWCAST,
             radius=self.view_radius,
         )
         if "earth vision" in self.status:
-            visible |= tcod.map.compute_fov(
-                transparency=~g.world.map.tiles["transparent"],
-                pov=self.xy,
+            visible[window] |= tcod.map.compute_fov(
+                transparency=~transparency,
+                pov=pov,
                 algorithm=tcod.FOV_SYMMETRIC_SHADOWCAST,
-                radius=0,
+                radius=self.view_radius,
             )
-        if plus_shared:
-            for actor in g.world.map.actors:
-                if actor is self or actor.share_vision is False or actor.faction != self.faction:
-                    continue
-                visible |= actor.get_fov(plus_shared=False)
+        visible.flags.writeable = False
         return visible
 
     def get_move_cost(self) -> np.ndarray:
-        """Get the real move cost of an actor."""
-        if self.can_walk is True and self.can_swim is False and self.can_fly is False:
-            return g.world.map.tiles["move_cost"].copy()  # type: ignore
-
-        # This fallback will have to do for now.
-        cost: np.ndarray = np.zeros_like(g.world.map.tiles, dtype=np.uint8)
-        if self.can_swim:
-            np.putmask(cost, g.world.map.tiles["swim_cost"] != 0, g.world.map.tiles["swim_cost"])
-        if self.can_walk:
-            np.putmask(cost, g.world.map.tiles["move_cost"] != 0, g.world.map.tiles["move_cost"])
-        if self.can_fly:
-            np.putmask(cost, g.world.map.tiles["fly_cost"] != 0, g.world.map.tiles["fly_cost"])
-        return cost
+        """Get the real move cost of an actor.  The returned array is shared and read-only."""
+        return g.world.map.get_move_cost(self.can_walk, self.can_swim, self.can_fly)
 
     def bump(self, other: Actor) -> bool:
         """Called when one actor bumps into another.
@@ -138,6 +174,8 @@ class Player(Actor):
     hp = 12
 
     def default_ai(self) -> engine.actions.Action:
+        if g.world.player_controller:
+            return g.world.player_controller(self)
         return engine.actions.PlayerControl(self)
 
 
@@ -165,6 +203,8 @@ def __init__(self, x: int, y: int):
         self.ch = str(self.timer)
 
     def explode(self) -> None:
+        if self not in g.world.map.actors:
+            return  # Already exploded.
         engine.actions.Blast(self, effect=engine.effects.Dig(power=10), range=2).perform()
         if self in g.world.map.actors:
             g.world.map.remove_actor(self)
@@ -176,11 +216,12 @@ def on_turn(self) -> None:
             self.explode()
         else:
             self.ch = str(self.timer)
+            g.world.map.record_change("actors", self.xy)  # The countdown changes how this is drawn.
 
-    def apply_effect(self, effect: engine.effects.Effect) -> None:
-        """Explodes immediately if hit with a heat attacks."""
+    def apply_effect(self, effect: engine.effects.Effect, source: Optional[Actor] = None) -> None:
+        """Explodes in the next chain reaction wave if hit with a heat attacks."""
         if isinstance(effect, engine.effects.Heat):
-            self.explode()
+            g.world.events.push(self.explode)
 
 
 class Totem(Actor):
@@ -191,11 +232,11 @@ def __init__(self, x: int, y: int):
         super().__init__(x, y)
         self.ch = "&"
 
-    def apply_effect(self, effect: engine.effects.Effect) -> None:
+    def apply_effect(self, effect: engine.effects.Effect, source: Optional[Actor] = None) -> None:
+        """Spreads the effect around this totem in the next chain reaction wave."""
         g.world.map.remove_actor(self)
-        for y in range(self.y - 2, self.y + 3):
-            for x in range(self.x - 2, self.x + 3):
-                effect.apply(x, y)
+        area = g.world.map.get_area(self.x, self.y, 2)
+        g.world.events.push(lambda: effect.apply_area(area, source))
 
 
 class FlyingBomb(Bomb):
@@ -213,7 +254,7 @@ class HunterEnemy(Actor):
 
     def bump(self, other: Actor) -> bool:
         if other.faction != self.faction:
-            self.attack_effect.apply(*other.xy)
+            self.attack_effect.apply(*other.xy, source=self)
             return True
         return False
 
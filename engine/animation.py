@@ -4,18 +4,21 @@
 """
 from __future__ import annotations
 
-from typing import Sequence
+from typing import List, Sequence
+import math
 import time
 
 import tcod
 
-from constants import CONSOLE_HEIGHT, CONSOLE_WIDTH
 import engine.rendering
+import engine.state
 import g
 
 
 def events_in_queue() -> bool:
     """Returns True if important events are waiting on the queue."""
+    if g.headless:
+        return False
     tcod.lib.SDL_PumpEvents()
     return bool(
         tcod.lib.SDL_HasEvent(tcod.lib.SDL_KEYDOWN)
@@ -24,6 +27,25 @@ def events_in_queue() -> bool:
     )
 
 
+def clear_base_frame() -> None:
+    """Discard the cached base frame.  This is called before every action so that the UI shown is up-to-date."""
+    g.base_frame = None
+
+
+def get_base_frame(width: int, height: int) -> tcod.console.Console:
+    """Return the main view without any layers, for a console of this size.
+
+    This is rendered at most once per action unless the map changes or the camera moves, such as between the waves
+    of a chain reaction.  The returned console must not be modified.
+    """
+    cache_key = (width, height, g.world.map, g.world.map.revision, g.world.map.camera)
+    if g.base_frame is None or g.base_frame[0] != cache_key:
+        console = tcod.Console(width, height, order="F")
+        engine.rendering.render_main(console)
+        g.base_frame = cache_key, console
+    return g.base_frame[1]
+
+
 class Animation:
     """Show the world when between player turns.
 
@@ -37,11 +59,94 @@ def __init__(self, layers: Sequence[engine.rendering.Layer] = (), sleep_time: fl
         self.sleep_time = sleep_time
 
     def show(self) -> None:
-        """Show this animation.  Presents a single frame."""
-        console = g.context.new_console(CONSOLE_WIDTH, CONSOLE_HEIGHT, order="F")
-        engine.rendering.render_main(console, visible_callbacks=self.layers)
+        """Show this animation.  Presents a single frame.
+
+        During the turns of other actors this is added to `queue` instead, and is shown before the players next turn.
+        """
+        if g.headless:
+            return
+        if queue.deferring:
+            queue.add(self)
+            return
+        self.present()
+
+    def present(self) -> None:
+        """Present this frame immediately, then sleep for `sleep_time`.
+
+        The frame is the cached base frame with only this animations layers drawn on top.
+        """
+        console = engine.state.get_console()
+        console.tiles_rgb[...] = get_base_frame(console.width, console.height).tiles_rgb
+        engine.rendering.render_layers(console, self.layers)
         g.context.present(console, integer_scaling=True)
         if not events_in_queue():  # Fast-forward if an important event is on the queue.
             # This could be improved with a good way to reference the last time a frame was drawn.
             # Until then this sleeps `sleep_time` time on top of how much time has already passed.
             time.sleep(self.sleep_time)
+
+
+class AnimationQueue:
+    """Collects the animations shown during the turns of other actors, so that they can be played back together.
+
+    Each actor turn adds a new sequence of frames.  When played back the frames of every sequence are merged, so that
+    animations which happened on the same turn are shown at the same time.
+
+    `time_budget` is the most time in seconds spent playing back animations before each player turn.  Frames are
+    dropped and sped up to fit within this budget.
+    """
+
+    MIN_FRAME_TIME = 1 / 60  # Frames are dropped when the budget can not fit them at this rate.
+
+    def __init__(self, time_budget: float = 1 / 2):
+        self.time_budget = time_budget
+        self.sequences: List[List[Animation]] = []
+        self.deferring = False  # True when animations are being added to this queue instead of being shown.
+
+    def start_sequence(self, deferring: bool) -> None:
+        """Start the frames for a new actor turn.  Animations are only queued if `deferring` is True."""
+        self.deferring = deferring
+        if deferring and (not self.sequences or self.sequences[-1]):
+            self.sequences.append([])
+
+    def add(self, animation: Animation) -> None:
+        """Add an animation to the current sequence.  Animations without any layers have nothing to show."""
+        if animation.layers:
+            self.sequences[-1].append(animation)
+
+    def get_frames(self) -> List[Animation]:
+        """Return the merged frames of all sequences."""
+        frames: List[Animation] = []
+        for i in range(max((len(sequence) for sequence in self.sequences), default=0)):
+            parts = [sequence[i] for sequence in self.sequences if i < len(sequence)]
+            layers = [layer for part in parts for layer in part.layers]
+            frames.append(Animation(layers, sleep_time=max(part.sleep_time for part in parts)))
+        return frames
+
+    def flush(self) -> None:
+        """Play back and clear all queued animations within `time_budget`.
+
+        Playback stops early if any important events are waiting, the same as `Animation.show`.
+        """
+        frames = self.get_frames()
+        self.sequences = []
+        self.deferring = False
+        if not frames or g.headless:
+            return
+        max_frames = max(1, int(self.time_budget / self.MIN_FRAME_TIME))
+        if len(frames) > max_frames:
+            frames = frames[:: math.ceil(len(frames) / max_frames)]
+        total_time = sum(frame.sleep_time for frame in frames)
+        if total_time > self.time_budget:
+            for frame in frames:
+                frame.sleep_time *= self.time_budget / total_time
+        clear_base_frame()  # The world has changed since these animations were queued.
+        deadline = time.perf_counter() + self.time_budget
+        for frame in frames:
+            if events_in_queue() or time.perf_counter() >= deadline:
+                break
+            frame.sleep_time = min(frame.sleep_time, max(0.0, deadline - time.perf_counter()))
+            frame.present()
+
+
+queue = AnimationQueue()
+"Animations shown during the turns of actors other than the player."
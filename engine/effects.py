@@ -1,57 +1,78 @@
 """A collection of combat effects."""
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any, Optional
+
 import engine.tiles
 import g
 
+if TYPE_CHECKING:
+    import engine.actor
+
 
 class Effect:
+    """Effects hit any actors in their area and then transform the tiles there.
+
+    Tile transformations are declared in `engine.tiles.TRANSFORMS`.
+    Any chain reactions caused by an effect are resolved before `apply` or `apply_area` return.
+    """
+
     name = "stuff"
 
     def __init__(self, power: int = 5):
         self.power = power
 
-    def apply(self, x: int, y: int) -> None:
-        for actor in [actor for actor in g.world.map.actors if x == actor.x and y == actor.y]:
-            actor.apply_effect(self)
+    def apply(self, x: int, y: int, source: Optional[engine.actor.Actor] = None) -> None:
+        """Apply this effect to a single tile.
+
+        `source` is the actor responsible for this effect, or None if it came from the map itself.
+        """
+        map_ = g.world.map
+        if not map_.in_bounds(x, y):
+            return
+        actor = map_.actor_at(x, y)
+        if actor is not None:
+            actor.apply_effect(self, source)
+        table = engine.tiles.TRANSFORM_TABLES.get(type(self))
+        if table is not None and table[map_.tiles[x, y]] != map_.tiles[x, y]:
+            map_.set_tiles((x, y), table[map_.tiles[x, y]])
+        g.world.events.resolve()
+
+    def apply_area(self, where: Any, source: Optional[engine.actor.Actor] = None) -> None:
+        """Apply this effect to all tiles at `where`, which is any in-bounds NumPy index of the map.
+
+        Every tile is transformed at once with a single lookup into this effects transform table.
+        """
+        map_ = g.world.map
+        for actor in map_.actors_in(where):
+            if actor in map_.actors:  # Skip actors removed by an earlier actor in this area.
+                actor.apply_effect(self, source)
+        table = engine.tiles.TRANSFORM_TABLES.get(type(self))
+        if table is not None:
+            old_tiles = map_.tiles[where]
+            new_tiles = table[old_tiles]
+            if (new_tiles != old_tiles).any():
+                map_.set_tiles(where, new_tiles)
+        g.world.events.resolve()
 
 
 class Cold(Effect):
     name = "ice"
 
-    def apply(self, x: int, y: int) -> None:
-        super().apply(x, y)
-        if g.world.map.tiles[x, y] == engine.tiles.WATER.as_np():
-            g.world.map.tiles[x, y] = engine.tiles.ICE_FLOOR
-        if g.world.map.tiles[x, y] == engine.tiles.ACID.as_np():
-            g.world.map.tiles[x, y] = engine.tiles.ICE_FLOOR
-
 
 class Heat(Effect):
     name = "fire"
 
-    def apply(self, x: int, y: int) -> None:
-        super().apply(x, y)
-        if g.world.map.tiles[x, y] == engine.tiles.ICE_FLOOR.as_np():
-            g.world.map.tiles[x, y] = engine.tiles.WATER
-        if g.world.map.tiles[x, y] == engine.tiles.ICE_WALL.as_np():
-            g.world.map.tiles[x, y] = engine.tiles.WATER
-
 
 class PlaceAcid(Effect):
     name = "acid"
 
-    def apply(self, x: int, y: int) -> None:
-        super().apply(x, y)
-        g.world.map.tiles[x, y] = engine.tiles.ACID
+
+class Corrode(Effect):
+    """Damage from standing in acid, this does not transform tiles."""
+
+    name = "acid"
 
 
 class Dig(Effect):
     name = "digging"
-
-    def apply(self, x: int, y: int) -> None:
-        super().apply(x, y)
-        if g.world.map.tiles[x, y] == engine.tiles.WALL.as_np():
-            g.world.map.tiles[x, y] = engine.tiles.RUBBLE
-        if g.world.map.tiles[x, y] == engine.tiles.ICE_WALL.as_np():
-            g.world.map.tiles[x, y] = engine.tiles.ICE_FLOOR
@@ -0,0 +1,58 @@
+"""Chain reaction module.
+
+Effects which trigger other effects, such as a bomb exploding after being heated, push events onto an `EventQueue`
+instead of performing them immediately.  The queue then resolves these events iteratively in breadth-first waves.
+"""
+from __future__ import annotations
+
+from typing import Callable, Deque, Iterable, List
+import collections
+
+import engine.animation
+import engine.rendering
+
+
+class EventQueue:
+    """A queue of pending events which are resolved in waves.
+
+    Each wave is every event which was pending when the wave started.  Events pushed during a wave are part of the
+    next wave.  All graphics added during a wave are shown together as a single animation frame.
+    """
+
+    def __init__(self) -> None:
+        self.pending: Deque[Callable[[], None]] = collections.deque()
+        self.layers: List[engine.rendering.Layer] = []  # Graphics to show at the end of the current wave.
+        self.resolving = False  # True while waves are being resolved.
+
+    def push(self, event: Callable[[], None]) -> None:
+        """Add an event to be performed in the next wave."""
+        self.pending.append(event)
+
+    def add_layers(self, layers: Iterable[engine.rendering.Layer]) -> None:
+        """Add graphics to the animation frame of the current wave."""
+        self.layers.extend(layers)
+
+    def show_wave(self) -> None:
+        """Show and clear the graphics of the current wave, if there are any."""
+        if self.layers:
+            engine.animation.Animation(self.layers, sleep_time=1 / 5).show()
+            self.layers = []
+
+    def resolve(self) -> None:
+        """Resolve all pending events.
+
+        This does nothing if the queue is already being resolved, the caller resolving it will handle any new events.
+        """
+        if self.resolving:
+            return
+        self.resolving = True
+        try:
+            self.show_wave()  # Graphics added before the first wave.
+            while self.pending:
+                wave = self.pending
+                self.pending = collections.deque()
+                for event in wave:
+                    event()
+                self.show_wave()
+        finally:
+            self.resolving = False
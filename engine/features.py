@@ -12,3 +12,7 @@ def __init__(self, x: int, y: int):
 
 class StairsDown(Feature):
     ch = ord(">")
+
+
+class StairsUp(Feature):
+    ch = ord("<")
@@ -0,0 +1,71 @@
+"""Headless simulation module.
+
+Runs the world without a display, with the player being controlled by an AI or a scripted controller.
+"""
+from __future__ import annotations
+
+from typing import Callable, NamedTuple, Optional
+import logging
+import time
+
+import engine.actions
+import engine.actor
+import engine.world
+import g
+import procgen.dungeon
+
+logger = logging.getLogger(__name__)
+
+
+def play(
+    level: int = 1,
+    max_turns: Optional[int] = None,
+    controller: Callable[[engine.actor.Actor], engine.actions.Action] = engine.actions.AutoPlay,
+    seed: Optional[int] = None,
+) -> engine.world.World:
+    """Play a new game without a display and return its world once the game is over.
+
+    `controller` makes the players actions.  The game ends when the player dies, wins, or has taken `max_turns` turns.
+
+    If `seed` is given then the game is reproducible.
+    """
+    g.headless = True
+    g.world = engine.world.World(seed)
+    g.world.player_controller = controller
+    g.world.map = procgen.dungeon.generate(g.world, level=level)
+    start_time = time.perf_counter()
+    g.world.loop(max_turns)
+    g.world.discard_prefetch()  # Don't leave this game's next level generating in the background.
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Simulated {g.world.turns} turns in {elapsed:.2f} seconds ({g.world.turns / elapsed:.1f} turns/sec).")
+    return g.world
+
+
+class GameStats(NamedTuple):
+    """The results of a single headless game."""
+
+    seed: int
+    turns: int  # Turns survived.
+    deepest_level: int
+    victory: bool
+    stuck: bool  # True if the player had nowhere left to go.
+    killed_by: Optional[str]  # None if the player survived.
+    wall_time: float  # Seconds taken to generate and play the game.
+
+
+def play_seeded(seed: int, max_turns: Optional[int] = None) -> GameStats:
+    """Play a headless game with `AutoPlay` from a fixed seed and return its stats.
+
+    This is the unit of work for running many games in a process pool, so it must remain picklable.
+    """
+    start_time = time.perf_counter()
+    world = play(max_turns=max_turns, seed=seed)
+    return GameStats(
+        seed=seed,
+        turns=world.turns,
+        deepest_level=world.deepest_level,
+        victory=world.victory,
+        stuck=world.stuck,
+        killed_by=world.killed_by,
+        wall_time=time.perf_counter() - start_time,
+    )
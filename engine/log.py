@@ -0,0 +1,71 @@
+"""Message log module.
+
+The log only keeps a fixed number of recent messages, and caches the wrapped height of each message so that drawing
+the log panel does not slow down as more messages are added.
+"""
+from __future__ import annotations
+
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+import collections
+
+import tcod
+
+
+class MessageLog:
+    """A ring buffer of text messages.
+
+    `capacity` is the number of recent messages to keep, older messages are discarded.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.messages: Deque[str] = collections.deque(maxlen=capacity)
+        self.count = 0  # The total number of messages ever added, including discarded messages.
+        self.heights: Dict[int, Deque[int]] = {}
+        "The wrapped height of each message in `messages`, by panel width."
+        self.visible_cache: Optional[Tuple[Tuple[int, int, int], List[Tuple[int, str]]]] = None
+        "The last result of `get_visible` and the (width, height, count) it was computed for."
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.messages)
+
+    def append(self, message: str) -> None:
+        """Add a new message, discarding the oldest message if the log is full."""
+        self.messages.append(message)
+        self.count += 1
+        for width, heights in self.heights.items():
+            heights.append(tcod.console.get_height_rect(width, message))
+
+    def get_heights(self, width: int) -> Deque[int]:
+        """Return the wrapped height of each message for a panel of `width`.
+
+        The heights are computed once for each width and then kept up-to-date as messages are added.
+        """
+        if width not in self.heights:
+            self.heights[width] = collections.deque(
+                (tcod.console.get_height_rect(width, message) for message in self.messages),
+                maxlen=self.messages.maxlen,
+            )
+        return self.heights[width]
+
+    def get_visible(self, width: int, height: int) -> List[Tuple[int, str]]:
+        """Return the newest messages which fit in a panel of `width` and `height`, oldest first.
+
+        Each item is a (y, message) tuple giving where the message should be printed.  Only the visible messages are
+        checked, and the result is cached until another message is added.
+        """
+        cache_key = width, height, self.count
+        if self.visible_cache is not None and self.visible_cache[0] == cache_key:
+            return self.visible_cache[1]
+        visible: List[Tuple[int, str]] = []
+        y = height
+        for message, message_height in zip(reversed(self.messages), reversed(self.get_heights(width))):
+            y -= message_height
+            if y < 0:
+                break
+            visible.append((y, message))
+        visible.reverse()
+        self.visible_cache = cache_key, visible
+        return visible
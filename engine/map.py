@@ -1,12 +1,15 @@
 """Map class module."""
 from __future__ import annotations
 
-from typing import Deque, NamedTuple, Optional, Set, Tuple, Type, Union
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Set, Tuple, Type, Union
 import collections
+import pickle
+import zlib
 
 import numpy as np
+import tcod
 
-from engine.tiles import TILE_DT
+from engine.tiles import TILE_TABLE
 import engine.actor
 import engine.features
 import engine.sched
@@ -56,6 +59,33 @@ def get_views(
         return screen_view, world_view
 
 
+JOURNAL_LENGTH = 256  # Changes older than this are forgotten and are treated as if the whole map had changed.
+MAX_SEEK_FIELDS = 16  # The number of seek fields kept, the least recently computed fields are discarded first.
+
+
+class MapChange(NamedTuple):
+    """A single entry of the `Map.journal`."""
+
+    revision: int  # The value of `Map.revision` after this change.
+    kind: str  # What was changed: "tiles", "actors", or "features".
+    area: Tuple[slice, slice]  # The bounding box of the change.
+
+
+def bounds_overlap(a: Tuple[slice, slice], b: Tuple[slice, slice]) -> bool:
+    """Return True if the bounding boxes `a` and `b` share any tiles."""
+    return bool(a[0].start < b[0].stop and b[0].start < a[0].stop and a[1].start < b[1].stop and b[1].start < a[1].stop)
+
+
+def bounds_intersection(a: Tuple[slice, slice], b: Tuple[slice, slice]) -> Optional[Tuple[slice, slice]]:
+    """Return the bounding box shared by `a` and `b`, or None if they don't overlap."""
+    if not bounds_overlap(a, b):
+        return None
+    return np.s_[
+        max(a[0].start, b[0].start) : min(a[0].stop, b[0].stop),
+        max(a[1].start, b[1].start) : min(a[1].stop, b[1].stop),
+    ]
+
+
 class Map:
     """Maps hold a descrete set of data which can be switched between more easily."""
 
@@ -63,29 +93,287 @@ def __init__(self, width: int, height: int, level: int) -> None:
         self.width = width
         self.height = height
         self.level = level
-        self.tiles = np.empty((width, height), TILE_DT, order="F")
-        self.tiles[:] = engine.tiles.DEFAULT
+        self.tiles: np.ndarray = np.full((width, height), engine.tiles.DEFAULT, dtype=engine.tiles.TILE_ID, order="F")
+        "The tile ID of each tile.  Tile properties are looked up with `get_field`."
+        self.revision = 0
+        "Incremented on every change recorded in `journal`."
+        self.journal: Deque[MapChange] = collections.deque(maxlen=JOURNAL_LENGTH)
+        "Recent changes to this map.  Caches can check `changes_since` to only update the areas which changed."
+        self.tiles_revision = 0
+        "The `revision` of the last change to `tiles`.  Caches derived from `tiles` compare against this."
         self.memory: np.ndarray = np.full((width, height), engine.rendering.SHROUD, order="F")
         self.explored: np.ndarray = np.zeros((width, height), dtype=bool, order="F")
+        self.explored_revision = 0  # Incremented whenever `explored` gains new tiles.
+        self.last_revealed: Optional[Tuple[np.ndarray, Tuple[slice, slice], int]] = None
+        "The last array passed to `reveal`, its bounding box, and the `revision` it was revealed at."
         self.actors: Set[engine.actor.Actor] = set()
+        self.occupancy: np.ndarray = np.zeros((width, height), dtype=np.int32, order="F")
+        "Actor handles indexed by position, zero means an empty tile.  Use `actor_at` or `actors_in` to query this."
+        self.actor_handles: Dict[int, engine.actor.Actor] = {}
+        self.next_handle = 1
+        self.vision_sharers: Dict[str, List[engine.actor.Actor]] = {}  # Actors with `share_vision` set, by faction.
+        self.shared_fov_cache: Dict[str, Tuple[List[np.ndarray], np.ndarray]] = {}  # {faction: (fovs, combined)}
+        self.cost_layers: Dict[Tuple[bool, bool, bool], Tuple[int, np.ndarray, np.ndarray]] = {}
+        "Move costs by locomotion.  {(can_walk, can_swim, can_fly): (tiles_revision, cost_by_id, cost)}"
+        self.seek_fields: Dict[Tuple[Tuple[int, int], bool, bool, bool], Tuple[int, np.ndarray]] = {}
+        "Distance maps towards a target.  {(target_xy, can_walk, can_swim, can_fly): (tiles_revision, distance)}"
+        self.explore_fields: Dict[Tuple[bool, bool, bool], Tuple[Any, np.ndarray]] = {}
+        "Distance maps towards unexplored tiles.  {(can_walk, can_swim, can_fly): (cache_key, distance)}"
         self.features: Set[engine.features.Feature] = set()
-        self.schedule: Deque[engine.sched.Schedulable] = collections.deque()
+        self.schedule = engine.sched.Scheduler()
         self.camera: Camera = Camera(0, 0)
+        self.start_xy: Tuple[int, int] = (0, 0)  # Where the player is placed when entering this map.
 
     def add_actor(self, actor: engine.actor.Actor) -> None:
         assert actor not in self.actors
+        assert not self.occupancy[actor.xy], f"{actor.xy} is already occupied."
         self.actors.add(actor)
-        self.schedule.append(actor)
+        self.occupancy[actor.xy] = self.next_handle
+        self.actor_handles[self.next_handle] = actor
+        self.next_handle += 1
+        if actor.share_vision:
+            self.vision_sharers.setdefault(actor.faction, []).append(actor)
+        self.schedule.add(actor)
+        self.record_change("actors", actor.xy)
 
     def remove_actor(self, actor: engine.actor.Actor) -> None:
         self.actors.remove(actor)
+        del self.actor_handles[self.occupancy[actor.xy]]
+        self.occupancy[actor.xy] = 0
+        if actor.share_vision:
+            self.vision_sharers[actor.faction].remove(actor)
         self.schedule.remove(actor)
+        self.record_change("actors", actor.xy)
+
+    def move_actor(self, actor: engine.actor.Actor, x: int, y: int) -> None:
+        """Move `actor` to `x`,`y`.  All actor movement must go though here to keep `occupancy` up-to-date."""
+        assert actor in self.actors
+        assert not self.occupancy[x, y], f"{(x, y)} is already occupied."
+        self.occupancy[x, y] = self.occupancy[actor.xy]
+        self.occupancy[actor.xy] = 0
+        moved: Tuple[slice, slice] = np.s_[min(x, actor.x) : max(x, actor.x) + 1, min(y, actor.y) : max(y, actor.y) + 1]
+        self.record_change("actors", moved)
+        actor.x, actor.y = x, y
+
+    def get_free_xy(self, x: int, y: int, actor: engine.actor.Actor) -> Tuple[int, int]:
+        """Return a position as close to `x`,`y` as possible where `actor` can be placed."""
+        for radius in range(max(self.width, self.height)):
+            for free_x, free_y in zip(*self.get_area(x, y, radius)):
+                if not self.is_blocked(int(free_x), int(free_y), actor):
+                    return int(free_x), int(free_y)
+        raise ValueError(f"There is no space for {actor.name} on level {self.level}.")
+
+    def actor_at(self, x: int, y: int) -> Optional[engine.actor.Actor]:
+        """Return the actor at `x`,`y`, or None if there isn't one."""
+        if not self.in_bounds(x, y):
+            return None
+        return self.actor_handles.get(self.occupancy[x, y])
+
+    def actors_in(self, where: Any) -> List[engine.actor.Actor]:
+        """Return the actors within `where`.
+
+        `where` is any NumPy index of this map, such as a boolean mask, a tuple of 2D slices, or coordinate arrays.
+        """
+        handles = self.occupancy[where]
+        return [self.actor_handles[handle] for handle in handles[handles != 0].tolist()]
 
     def add_feature(self, feature: engine.features.Feature) -> None:
         self.features.add(feature)
+        self.record_change("features", (feature.x, feature.y))
 
     def remove_feature(self, feature: engine.features.Feature) -> None:
         self.features.remove(feature)
+        self.record_change("features", (feature.x, feature.y))
+
+    def get_bounds(self, where: Any) -> Tuple[slice, slice]:
+        """Return the bounding box of `where` as a pair of slices.
+
+        `where` is any NumPy index of this map.  Slices, positions and coordinate arrays are handled without
+        touching the rest of the map, any other index is converted to a mask first.
+        """
+        if isinstance(where, tuple) and len(where) == 2:
+            if isinstance(where[0], slice) and isinstance(where[1], slice):
+                left, right, _ = where[0].indices(self.width)
+                top, bottom, _ = where[1].indices(self.height)
+                return np.s_[left : max(left, right), top : max(top, bottom)]
+            if not isinstance(where[0], slice) and not isinstance(where[1], slice):
+                x, y = np.asarray(where[0]), np.asarray(where[1])
+                if x.dtype != bool:
+                    if not x.size:
+                        return np.s_[0:0, 0:0]
+                    return np.s_[int(x.min()) : int(x.max()) + 1, int(y.min()) : int(y.max()) + 1]
+        if isinstance(where, np.ndarray) and where.dtype == bool and where.shape == self.tiles.shape:
+            mask = where
+        else:
+            mask = np.zeros((self.width, self.height), dtype=bool)
+            mask[where] = True
+        columns = np.flatnonzero(mask.any(axis=1))
+        rows = np.flatnonzero(mask.any(axis=0))
+        if not columns.size:
+            return np.s_[0:0, 0:0]
+        return np.s_[int(columns[0]) : int(columns[-1]) + 1, int(rows[0]) : int(rows[-1]) + 1]
+
+    def record_change(self, kind: str, where: Any) -> None:
+        """Record a change of `kind` to the tiles at `where` in the journal and advance `revision`.
+
+        `kind` is one of "tiles", "actors", or "features".  `where` is any NumPy index of this map.
+        """
+        self.revision += 1
+        if kind == "tiles":
+            self.tiles_revision = self.revision
+        self.journal.append(MapChange(self.revision, kind, self.get_bounds(where)))
+
+    def changes_since(self, revision: int, kind: Optional[str] = None) -> Optional[Tuple[slice, slice]]:
+        """Return the bounding box of every change after `revision`, or None if nothing has changed.
+
+        If `kind` is given then only changes of that kind are included.  If the journal no longer goes back to
+        `revision` then the whole map is returned.
+        """
+        if revision >= self.revision:
+            return None
+        if not self.journal or self.journal[0].revision > revision + 1:
+            return np.s_[0 : self.width, 0 : self.height]
+        bounds: Optional[Tuple[slice, slice]] = None
+        for change in reversed(self.journal):
+            if change.revision <= revision:
+                break
+            if kind is not None and change.kind != kind:
+                continue
+            if bounds is None:
+                bounds = change.area
+            else:
+                bounds = np.s_[
+                    min(bounds[0].start, change.area[0].start) : max(bounds[0].stop, change.area[0].stop),
+                    min(bounds[1].start, change.area[1].start) : max(bounds[1].stop, change.area[1].stop),
+                ]
+        return bounds
+
+    def has_changed(self, revision: int, kind: Optional[str], area: Tuple[slice, slice]) -> bool:
+        """Return True if any change after `revision` touched the bounding box `area`.
+
+        `kind` filters the changes the same way as `changes_since`.
+        """
+        changed = self.changes_since(revision, kind)
+        return changed is not None and bounds_overlap(changed, area)
+
+    def get_shared_fov(self, faction: str) -> Optional[np.ndarray]:
+        """Return the combined read-only FOV of every actor sharing its vision with `faction`.
+
+        Returns None if no actors share vision with this faction.
+        The result is cached until any of the contributing FOV's change.
+        """
+        sharers = self.vision_sharers.get(faction)
+        if not sharers:
+            return None
+        fovs = [actor.get_fov(plus_shared=False) for actor in sharers]
+        cached = self.shared_fov_cache.get(faction)
+        if cached and len(cached[0]) == len(fovs) and all(old is new for old, new in zip(cached[0], fovs)):
+            return cached[1]
+        combined: np.ndarray = np.logical_or.reduce(fovs)
+        combined.flags.writeable = False
+        self.shared_fov_cache[faction] = fovs, combined
+        return combined
+
+    def get_move_cost(self, can_walk: bool, can_swim: bool, can_fly: bool) -> np.ndarray:
+        """Return the read-only move cost of this map for the given locomotion.
+
+        Cost layers are cached, when the tiles change only the area from `changes_since` is updated in place.
+        """
+        layer_key = can_walk, can_swim, can_fly
+        cached = self.cost_layers.get(layer_key)
+        if cached:
+            revision, table, layer = cached
+            if revision != self.tiles_revision:
+                changed = self.changes_since(revision, "tiles")
+                if changed is not None:
+                    layer.flags.writeable = True
+                    layer[changed] = table[self.tiles[changed]]
+                    layer.flags.writeable = False
+                self.cost_layers[layer_key] = self.tiles_revision, table, layer
+            return layer
+        cost_by_id = np.zeros(len(TILE_TABLE), dtype=np.uint8)  # Computed for each tile ID, then for the whole map.
+        if can_swim:
+            np.putmask(cost_by_id, TILE_TABLE["swim_cost"] != 0, TILE_TABLE["swim_cost"])
+        if can_walk:
+            np.putmask(cost_by_id, TILE_TABLE["move_cost"] != 0, TILE_TABLE["move_cost"])
+        if can_fly:
+            np.putmask(cost_by_id, TILE_TABLE["fly_cost"] != 0, TILE_TABLE["fly_cost"])
+        cost: np.ndarray = cost_by_id[self.tiles]
+        cost.flags.writeable = False
+        self.cost_layers[layer_key] = self.tiles_revision, cost_by_id, cost
+        return cost
+
+    def get_seek_field(self, actor: engine.actor.Actor, target_xy: Tuple[int, int]) -> np.ndarray:
+        """Return a read-only distance map towards `target_xy` for the locomotion of `actor`.
+
+        The map is shared by all actors with the same locomotion chasing the same target, and is only recomputed
+        when the tiles change or the target moves.  So it's computed at most once per turn for any number of seekers
+        chasing the same target.
+        """
+        field_key = target_xy, actor.can_walk, actor.can_swim, actor.can_fly
+        cached = self.seek_fields.get(field_key)
+        if cached and cached[0] == self.tiles_revision:
+            return cached[1]
+        distance: np.ndarray = tcod.path.maxarray((self.width, self.height), order="F")
+        distance[target_xy] = 0
+        tcod.path.dijkstra2d(distance, actor.get_move_cost(), cardinal=2, diagonal=3)
+        distance.flags.writeable = False
+        self.seek_fields.pop(field_key, None)
+        self.seek_fields[field_key] = self.tiles_revision, distance
+        while len(self.seek_fields) > MAX_SEEK_FIELDS:
+            del self.seek_fields[next(iter(self.seek_fields))]
+        return distance
+
+    def get_explore_field(self, actor: engine.actor.Actor) -> np.ndarray:
+        """Return a read-only distance map towards the unexplored tiles of this map.
+
+        The map is shared by all explorers with the same locomotion as `actor`.  It is only recomputed after the
+        tiles change or after `reveal` explores new tiles.
+        """
+        field_key = actor.can_walk, actor.can_swim, actor.can_fly
+        cache_key = self.tiles_revision, self.explored_revision
+        cached = self.explore_fields.get(field_key)
+        if cached and cached[0] == cache_key:
+            return cached[1]
+        cost = np.where(self.get_field("dangerous"), 0, actor.get_move_cost())  # Avoid acid tiles.
+        distance: np.ndarray = tcod.path.maxarray((self.width, self.height), order="F")
+        unexplored = ~self.explored
+        distance[unexplored] = 0
+        cost[unexplored] = 1
+        tcod.path.dijkstra2d(distance, cost, cardinal=2, diagonal=3)
+        distance.flags.writeable = False
+        self.explore_fields[field_key] = cache_key, distance
+        return distance
+
+    def get_area(self, x: int, y: int, radius: int, with_center: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the coordinate arrays of the square of tiles within `radius` of `x`,`y`.
+
+        The square is clipped to the bounds of this map.  The result can be used to index any array of this map.
+        """
+        view: Tuple[slice, slice] = np.s_[max(0, x - radius) : x + radius + 1, max(0, y - radius) : y + radius + 1]
+        mask = np.ones(self.tiles[view].shape, dtype=bool)
+        if not with_center and self.in_bounds(x, y):
+            mask[x - view[0].start, y - view[1].start] = False
+        area_x, area_y = np.nonzero(mask)
+        return area_x + view[0].start, area_y + view[1].start
+
+    def get_field(self, name: str, where: Any = ...) -> Any:
+        """Return the `name` property of the tiles at `where`, such as "move_cost" or "transparent".
+
+        `where` is any NumPy index of this map, by default the whole map is returned.  The result is a new array, or
+        a scalar if `where` was a single position.
+        """
+        return TILE_TABLE[name][self.tiles[where]]
+
+    def set_tiles(self, where: Any, tile: Any) -> None:
+        """Assign the tile ID `tile` to the tiles at `where`, which is any NumPy index of this map.
+
+        `tile` can also be an array of tile IDs broadcastable to `where`.
+
+        Changes to `tiles` during play should use this so that cached data is invalidated.
+        """
+        self.tiles[where] = tile
+        self.record_change("tiles", where)
 
     def in_bounds(self, x: int, y: int) -> bool:
         """Returns True if `x`,`y` is in bounds of this map."""
@@ -101,21 +389,61 @@ def is_blocked(
             walk, swim, fly = True, False, False
         else:
             walk, swim, fly = actor.can_walk, actor.can_swim, actor.can_fly
-        if not (
-            (walk and self.tiles["move_cost"][x, y])
-            or (swim and self.tiles["swim_cost"][x, y])
-            or (fly and self.tiles["fly_cost"][x, y])
-        ):
+        tile = TILE_TABLE[self.tiles[x, y]]
+        if not ((walk and tile["move_cost"]) or (swim and tile["swim_cost"]) or (fly and tile["fly_cost"])):
             return True  # Blocked by tile.
-        for other in self.actors:
-            if other.x == x and other.y == y:
-                return other  # Space taken by actor.
+        other = self.actor_handles.get(self.occupancy[x, y])
+        if other is not None:
+            return other  # Space taken by actor.
         return False
 
+    def clear_caches(self) -> None:
+        """Discard all cached data, it will be computed again when it's needed."""
+        self.journal.clear()
+        self.last_revealed = None
+        self.shared_fov_cache.clear()
+        self.cost_layers.clear()
+        self.seek_fields.clear()
+        self.explore_fields.clear()
+        for actor in self.actors:
+            actor.fov_cache = None
+            actor.plus_shared_cache = None
+
+    def freeze(self) -> bytes:
+        """Return a compressed snapshot of this map, used to keep levels which the player left a while ago.
+
+        Caches and the AI of actors are discarded first, the AI is chosen again once the snapshot is thawed.
+        """
+        self.clear_caches()
+        for actor in self.actors:
+            actor.ai = None
+        return zlib.compress(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def thaw(snapshot: bytes) -> Map:
+        """Return the map from a snapshot made by `freeze`."""
+        map_: Map = pickle.loads(zlib.decompress(snapshot))
+        return map_
+
     def reveal(self, touched: np.ndarray) -> None:
-        """Reveal the `touched` tiles."""
-        map_tiles = engine.rendering.render_map(self, world_view=None, fullbright=True)
+        """Remember the `touched` tiles in `memory` and mark them as explored.
+
+        `touched` is a read-only mask such as an actors FOV.  Only the bounding box of `touched` is rendered, and if
+        the same array is passed again then only the area changed since the last call is rendered.
+        """
+        if self.last_revealed is not None and self.last_revealed[0] is touched:
+            _, touched_bounds, revision = self.last_revealed
+            changed = self.changes_since(revision)
+            area = changed and bounds_intersection(changed, touched_bounds)
+        else:
+            touched_bounds = area = self.get_bounds(touched)
+        self.last_revealed = touched, touched_bounds, self.revision
+        if not area or area[0].start == area[0].stop or area[1].start == area[1].stop:
+            return
+        map_tiles = engine.rendering.render_map(self, world_view=area, fullbright=True)
         map_tiles["fg"] //= 4
         map_tiles["bg"] //= 4
-        np.putmask(self.memory, touched, map_tiles)
-        self.explored |= touched
+        np.putmask(self.memory[area], touched[area], map_tiles)
+        if (touched[area] & ~self.explored[area]).any():
+            self.explored[area] |= touched[area]
+            self.explored_revision += 1
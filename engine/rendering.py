@@ -1,7 +1,7 @@
 """Rendering functions."""
 from __future__ import annotations
 
-from typing import Iterable, Optional, Tuple
+from typing import Any, Callable, Iterable, Optional, Tuple
 import time
 
 import numpy as np
@@ -16,6 +16,9 @@
 SHROUD = np.asarray((ord(" "), (0x40, 0x40, 0x40), (0x00, 0x00, 0x00)), dtype=tile_graphic)
 "The clear graphic before drawing world tiles."
 
+sprite_graphic = np.dtype([("ch", np.int32), ("fg", "3B")])
+"The fields of `tile_graphic` which sprites draw over, the background is kept."
+
 
 class Layer:
     """Post process rendering callback."""
@@ -55,6 +58,28 @@ def render(self, output: np.ndarray, world_view: Tuple[slice, slice]) -> None:
         output[["ch", "fg"]][x, y] = self.ch, self.fg
 
 
+class SpriteBatch(Layer):
+    """Apply many sprites to the world at once.
+
+    `x` and `y` are sequences of world positions.  `ch` and `fg` are the glyph and color of each sprite, or a single
+    glyph and color shared by every sprite.  Where sprites overlap the last one is shown.
+    """
+
+    def __init__(self, x: Any, y: Any, ch: Any, fg: Any):
+        self.x: np.ndarray = np.asarray(x, dtype=np.intp)
+        self.y: np.ndarray = np.asarray(y, dtype=np.intp)
+        self.graphics = np.empty(self.x.shape, dtype=sprite_graphic)
+        if self.x.size:
+            self.graphics["ch"] = ch
+            self.graphics["fg"] = fg
+
+    def render(self, output: np.ndarray, world_view: Tuple[slice, slice]) -> None:
+        x = self.x - world_view[0].start
+        y = self.y - world_view[1].start
+        inside = (0 <= x) & (x < output.shape[0]) & (0 <= y) & (y < output.shape[1])
+        output[["ch", "fg"]][x[inside], y[inside]] = self.graphics[inside]
+
+
 def render_map(
     map_: engine.map.Map,
     world_view: Optional[Tuple[slice, slice]],
@@ -73,21 +98,24 @@ def render_map(
     """
     if not world_view:
         world_view = slice(0, map_.width), slice(0, map_.height)
-    output: np.ndarray = map_.tiles["graphic"][world_view].copy()
+    output: np.ndarray = map_.get_field("graphic", world_view)
 
-    cam_x, cam_y = world_view[0].start, world_view[1].start
     # Render features.
-    for feature in map_.features:
-        x = feature.x - cam_x
-        y = feature.y - cam_y
-        if 0 <= x < output.shape[0] and 0 <= y < output.shape[1]:
-            output[["ch", "fg"]][x, y] = feature.ch, feature.fg
+    features = list(map_.features)
+    SpriteBatch(
+        [feature.x for feature in features],
+        [feature.y for feature in features],
+        [feature.ch for feature in features],
+        [feature.fg for feature in features],
+    ).render(output, world_view)
     # Render all actors.
-    for actor in map_.actors:
-        x = actor.x - cam_x
-        y = actor.y - cam_y
-        if 0 <= x < output.shape[0] and 0 <= y < output.shape[1]:
-            output[["ch", "fg"]][x, y] = ord(actor.ch), actor.fg
+    actors = map_.actors_in(world_view)
+    SpriteBatch(
+        [actor.x for actor in actors],
+        [actor.y for actor in actors],
+        [ord(actor.ch) for actor in actors],
+        [actor.fg for actor in actors],
+    ).render(output, world_view)
 
     for callback in visible_callbacks:
         callback.render(output, world_view)
@@ -101,12 +129,11 @@ def render_map(
 
 def debug_map(map_: engine.map.Map, sleep_time: float = 0) -> None:
     """Present the current map tiles.  This is ignored on release mode."""
-    if not g.debug_dungeon_generation:
+    if g.headless or not g.debug_dungeon_generation:
         return
     for ev in tcod.event.get():
         if isinstance(ev, tcod.event.KeyDown):
             g.debug_dungeon_generation = False
-    g.world.map = map_
     console = tcod.Console(map_.width, map_.height, order="F")
     console.tiles_rgb[:] = render_map(map_, world_view=None, fullbright=True)
     g.context.present(console)
@@ -122,35 +149,71 @@ def debug_map(map_: engine.map.Map, sleep_time: float = 0) -> None:
 TEXT_UNIMPORTANT = (128, 128, 128)
 
 
-def render_slots(console: tcod.console.Console) -> None:
-    """Render the spell slots UI."""
-    x = console.width - UI_SIZE[0] + 1
-    console.tiles_rgb[x - 1, :] = ord("▒"), BORDER_COLOR, BLACK
+class Panel:
+    """A persistent console which is only drawn again when its contents change.
+
+    `draw` is called with the cleared console whenever the `cache_key` passed to `get` changes.
+    """
+
+    def __init__(self, draw: Callable[[tcod.console.Console], None]):
+        self.draw = draw
+        self.console: Optional[tcod.console.Console] = None
+        self.cache_key: Any = None
+
+    def get(self, width: int, height: int, cache_key: Any) -> tcod.console.Console:
+        """Return this panel drawn for `cache_key` with the given size."""
+        if self.console is None or (self.console.width, self.console.height) != (width, height):
+            self.console = tcod.Console(width, height, order="F")
+        elif self.cache_key == cache_key:
+            return self.console
+        self.console.clear(fg=TEXT_COLOR, bg=BG)
+        self.draw(self.console)
+        self.cache_key = cache_key
+        return self.console
+
+
+def draw_slots(panel: tcod.console.Console) -> None:
+    """Draw the spell slots onto the slots panel."""
     for i, spell in enumerate(g.world.spell_slots):
         if spell is None:
             continue  # Skip drawing this slot.
-        spell_name = "--------" if spell is None else spell.name
-        spell_console = tcod.console.Console(UI_SIZE[0] - 1, 6, order="F")
-        spell_console.print(0, 0, f"{i+1:2d}. {spell_name}", fg=TEXT_COLOR, bg=BG)
-        if spell is not None:
-            spell_console.print(0, 1, f"Cooldown: {spell.cooldown_left}/{spell.cooldown_length}", fg=TEXT_COLOR, bg=BG)
-            spell_console.print_box(0, 2, 0, 0, spell.desc, fg=TEXT_UNIMPORTANT, bg=BG)
+        y = i * 6
+        panel.print(0, y, f"{i+1:2d}. {spell.name}", fg=TEXT_COLOR, bg=BG)
+        panel.print(0, y + 1, f"Cooldown: {spell.cooldown_left}/{spell.cooldown_length}", fg=TEXT_COLOR, bg=BG)
+        panel.print_box(0, y + 2, panel.width, 4, spell.desc, fg=TEXT_UNIMPORTANT, bg=BG)
 
-        spell_console.blit(console, x, i * 6)
+
+def render_slots(console: tcod.console.Console) -> None:
+    """Render the spell slots UI."""
+    x = console.width - UI_SIZE[0] + 1
+    console.tiles_rgb[x - 1, :] = ord("▒"), BORDER_COLOR, BLACK
+    cache_key = tuple(spell and (spell, spell.cooldown_left) for spell in g.world.spell_slots)
+    SLOTS_PANEL.get(UI_SIZE[0] - 1, console.height, cache_key).blit(console, x, 0)
 
 
 def render_log(log_console: tcod.console.Console) -> None:
     """Render the log to a dedicated console."""
-    y = log_console.height
-    for message in reversed(g.world.log):
-        y -= tcod.console.get_height_rect(log_console.width, message)
-        if y < 0:
-            break
+    for y, message in g.world.log.get_visible(log_console.width, log_console.height):
         log_console.print_box(0, y, 0, 0, message, fg=TEXT_COLOR, bg=BG)
 
 
+def draw_status(status_console: tcod.console.Console) -> None:
+    """Draw the player status onto the status panel."""
+    status_console.print(0, 0, f"Status - {g.world.player.x},{g.world.player.y}")
+    status_console.print(0, 1, f"HP {g.world.player.hp}")
+    status_console.print(0, status_console.height - 1, f"Dungeon level {g.world.map.level}")
+
+
+SLOTS_PANEL = Panel(draw_slots)
+LOG_PANEL = Panel(render_log)
+STATUS_PANEL = Panel(draw_status)
+
+
 def render_main(console: tcod.console.Console, visible_callbacks: Iterable[Layer] = ()) -> None:
-    """Rendeer the main view.  With the world tiles, any objects, and the UI."""
+    """Rendeer the main view.  With the world tiles, any objects, and the UI.
+
+    The UI panels are only drawn again when what they show has changed, otherwise they are only blitted.
+    """
     # Render map view.
     console_shape = (console.width - UI_SIZE[0], console.height - UI_SIZE[1])
     screen_view, world_view = g.world.map.camera.get_views(g.world.map.tiles.shape, console_shape)
@@ -165,17 +228,28 @@ def render_main(console: tcod.console.Console, visible_callbacks: Iterable[Layer
     console.tiles_rgb[: -UI_SIZE[0], -UI_SIZE[1]] = 0x2592, BORDER_COLOR, BLACK  # Bar along the lower end of the map.
     console.tiles_rgb[-UI_SIZE[0] - STATUS_WIDTH - 1, -UI_SIZE[1] :] = (0x2592, BORDER_COLOR, BLACK)  # log/status bar.
 
-    log_console = tcod.Console(console.width - UI_SIZE[0] - STATUS_WIDTH - 1, UI_SIZE[1] - 1)
-    render_log(log_console)
+    log_console = LOG_PANEL.get(
+        console.width - UI_SIZE[0] - STATUS_WIDTH - 1, UI_SIZE[1] - 1, (g.world.log, g.world.log.count)
+    )
     log_console.blit(console, 0, console.height - UI_SIZE[1] + 1)
 
-    status_console = tcod.Console(STATUS_WIDTH, UI_SIZE[1] - 1)
-    status_console.print(0, 0, f"Status - {g.world.player.x},{g.world.player.y}")
-    status_console.print(0, 1, f"HP {g.world.player.hp}")
-    status_console.print(0, status_console.height - 1, f"Dungeon level {g.world.map.level}")
+    player = g.world.player
+    status_console = STATUS_PANEL.get(STATUS_WIDTH, UI_SIZE[1] - 1, (player.x, player.y, player.hp, g.world.map.level))
     status_console.blit(console, console.width - UI_SIZE[0] - STATUS_WIDTH, console.height - UI_SIZE[1] + 1)
 
 
+def render_layers(console: tcod.console.Console, layers: Iterable[Layer]) -> None:
+    """Draw `layers` directly over the map view of a console which was already drawn with `render_main`.
+
+    This only touches the tiles drawn by the layers, so it's much cheaper than calling `render_main` again.
+    """
+    console_shape = (console.width - UI_SIZE[0], console.height - UI_SIZE[1])
+    screen_view, world_view = g.world.map.camera.get_views(g.world.map.tiles.shape, console_shape)
+    output = console.tiles_rgb[screen_view]
+    for layer in layers:
+        layer.render(output, world_view)
+
+
 def print_extra_text(console: tcod.console.Console, message: str) -> None:
     """Prints extra temporary text.
 
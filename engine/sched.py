@@ -1,9 +1,58 @@
 """Event scheduler module.
 """
+from __future__ import annotations
+
+from typing import Any, Dict, List
+import heapq
 
 
 class Schedulable:
-    skip_turns: int = 0
+    skip_turns: int = 0  # Extra time units added to the delay of the next turn.
 
     def on_turn(self) -> None:
         pass
+
+
+class Scheduler:
+    """A priority queue of objects ordered by the time of their next turn.
+
+    Adding, rescheduling, and removing objects are all O(log n) or better.  Objects scheduled for the same time take
+    their turns in the order they were scheduled.
+    """
+
+    def __init__(self) -> None:
+        self.time = 0  # The time of the object currently taking its turn.
+        self.heap: List[List[Any]] = []  # Heap of [time, order, obj] entries.  Cancelled entries have obj=None.
+        self.entries: Dict[Schedulable, List[Any]] = {}  # The active heap entry of each scheduled object.
+        self.next_order = 0
+
+    def add(self, obj: Schedulable, delay: int = 0) -> None:
+        """Schedule `obj` to take a turn `delay` time units from now."""
+        assert obj not in self.entries
+        entry = [self.time + delay, self.next_order, obj]
+        self.next_order += 1
+        self.entries[obj] = entry
+        heapq.heappush(self.heap, entry)
+
+    def remove(self, obj: Schedulable) -> None:
+        """Cancel the next turn of `obj`.  The entry is left on the heap and skipped later."""
+        self.entries.pop(obj)[-1] = None
+
+    def reschedule(self, obj: Schedulable, delay: int) -> None:
+        """Move the next turn of `obj` to `delay` time units from now."""
+        self.remove(obj)
+        self.add(obj, delay)
+
+    def peek(self) -> Schedulable:
+        """Return the object with the next turn.  This advances `time` to the time of that turn."""
+        while self.heap[0][-1] is None:
+            heapq.heappop(self.heap)
+        self.time = self.heap[0][0]
+        obj: Schedulable = self.heap[0][-1]
+        return obj
+
+    def __contains__(self, obj: Schedulable) -> bool:
+        return obj in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
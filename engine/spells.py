@@ -1,7 +1,7 @@
 """The collection of player spells."""
 from __future__ import annotations
 
-from typing import Any, Optional, Type
+from typing import Any, Optional, Tuple, Type
 import warnings
 
 import engine.actions
@@ -24,7 +24,8 @@ def generate_desc(self) -> str:
         """Generate a description."""
         return self.desc
 
-    def cast(self, actor: engine.actor.Actor) -> bool:
+    def cast(self, actor: engine.actor.Actor, direction: Optional[Tuple[int, int]] = None) -> bool:
+        """Cast this spell.  `direction` is used by directional spells, the player is asked for it if it's None."""
         raise NotImplementedError("Must be overridden.")
 
 
@@ -36,8 +37,8 @@ def __init__(self, *, spawn: Type[engine.actor.Actor], **kargs: Any):
     def generate_desc(self) -> str:
         return f"Create a new {self.spawn.name} nearby."
 
-    def cast(self, actor: engine.actor.Actor) -> bool:
-        return engine.actions.PlaceActor(actor, spawn=self.spawn).perform()
+    def cast(self, actor: engine.actor.Actor, direction: Optional[Tuple[int, int]] = None) -> bool:
+        return engine.actions.PlaceActor(actor, spawn=self.spawn, direction=direction).perform()
 
 
 class Beam(Spell):
@@ -48,8 +49,8 @@ def __init__(self, *, effect: engine.effects.Effect, **kargs: Any):
     def generate_desc(self) -> str:
         return f"Fire a concentrated beam of {self.effect.name}."
 
-    def cast(self, actor: engine.actor.Actor) -> bool:
-        return engine.actions.Beam(actor, effect=self.effect).perform()
+    def cast(self, actor: engine.actor.Actor, direction: Optional[Tuple[int, int]] = None) -> bool:
+        return engine.actions.Beam(actor, effect=self.effect, direction=direction).perform()
 
 
 class Blast(Spell):
@@ -61,7 +62,7 @@ def __init__(self, *, effect: engine.effects.Effect, range: int, **kargs: Any):
     def generate_desc(self) -> str:
         return f"Create a wave of {self.effect.name} from the caster.\nRange {self.range}."
 
-    def cast(self, actor: engine.actor.Actor) -> bool:
+    def cast(self, actor: engine.actor.Actor, direction: Optional[Tuple[int, int]] = None) -> bool:
         return engine.actions.Blast(actor, effect=self.effect, range=self.range).perform()
 
 
@@ -72,6 +73,6 @@ def __init__(self, *, length: int, **kargs: Any):
         self.length = length
         super().__init__(**kargs)
 
-    def cast(self, actor: engine.actor.Actor) -> bool:
+    def cast(self, actor: engine.actor.Actor, direction: Optional[Tuple[int, int]] = None) -> bool:
         actor.status["earth vision"] = self.length
         return True
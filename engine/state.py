@@ -56,35 +56,58 @@
 }
 
 
+def get_console() -> tcod.console.Console:
+    """Return the console for drawing a new frame, sized for the current window.
+
+    The same console is reused between frames, so the caller must clear or fully draw over it.
+    """
+    width, height = g.context.recommended_console_size(CONSOLE_WIDTH, CONSOLE_HEIGHT)
+    if g.console is None or (g.console.width, g.console.height) != (width, height):
+        g.console = tcod.Console(width, height, order="F")
+    return g.console
+
+
 class State(tcod.event.EventDispatch[None]):
     """An abstract state.  Subclasses should be made of this class to handle state."""
 
+    dirty = True  # If True then this state will be drawn again before waiting for more events.
+
     def run_modal(self) -> None:
         """Run this state in a modal loop.
 
         This state takes effect and this function doesn't return until the state is removed from g.states.
+
+        A frame is only drawn when the active state is `dirty`, otherwise this waits for events without drawing.
         """
         assert self not in g.states
         g.states.append(self)
-        while self in g.states:
-            # Rendering.
-            console = g.context.new_console(CONSOLE_WIDTH, CONSOLE_HEIGHT, order="F")
-            if g.debug_rendering:
-                console.clear(bg=(0xFF, 0x00, 0xFF))  # Unhandled areas are now magic pink.
-            g.states[-1].on_draw(console)
-            g.context.present(console, integer_scaling=True)
-            if self not in g.states:
-                return
-            # Handle input.
-            for event in tcod.event.wait():
-                g.states[-1].dispatch(event)
-                if self not in g.states:
-                    return
+        self.dirty = True
+        try:
+            while self in g.states:
+                # Rendering.
+                if g.states[-1].dirty:
+                    g.states[-1].dirty = False
+                    console = get_console()
+                    console.clear(bg=(0xFF, 0x00, 0xFF) if g.debug_rendering else (0, 0, 0))
+                    g.states[-1].on_draw(console)
+                    g.context.present(console, integer_scaling=True)
+                    if self not in g.states:
+                        return
+                # Handle input.
+                for event in tcod.event.wait():
+                    if isinstance(event, tcod.event.WindowEvent):
+                        g.states[-1].dirty = True  # The window may need to be drawn again.
+                    g.states[-1].dispatch(event)
+                    if self not in g.states:
+                        return
+        finally:
+            if g.states:
+                g.states[-1].dirty = True  # This state was drawn over the next state.
 
     def on_draw(self, console: tcod.console.Console) -> None:
         """Called when this state should be rendered.
 
-        `console` will be cleared and drawn by the caller.
+        `console` will be cleared and drawn by the caller.  This is only called when `dirty` is True.
         """
 
     def cmd_cancel(self) -> None:
@@ -120,7 +143,11 @@ def debug_regenerate_map(self) -> None:
         """Regenerate the current map."""
 
     def ev_keydown(self, event: tcod.event.KeyDown) -> None:
-        """Dispatch keys to various commands.  This creates a consistant interface across states."""
+        """Dispatch keys to various commands.  This creates a consistant interface across states.
+
+        Commands can change what is shown, so this marks the state as `dirty`.
+        """
+        self.dirty = True
         shift = bool(event.mod & tcod.event.KMOD_SHIFT)
         if event.sym == tcod.event.K_ESCAPE:
             self.cmd_cancel()
@@ -70,12 +70,7 @@ def cmd_cast(self, index: int) -> None:
         spell = g.world.spell_slots[index]
         if not spell:
             return
-        if spell.cooldown_left:
-            g.world.report(f"{spell.name} is on cooldown!")
-            return
-        g.world.report(f"You cast {spell.name}")
-        if spell.cast(g.world.player):
-            spell.cooldown_left = spell.cooldown_length + 1
+        if g.world.cast_spell(spell):
             g.states.pop()
 
     def cmd_down(self) -> None:
@@ -84,14 +79,22 @@ def cmd_down(self) -> None:
                 continue
             if not isinstance(obj, engine.features.StairsDown):
                 continue
-            g.world.player.hp = 12
-            if g.world.map.level + 1 != 4:
-                g.world.map = procgen.dungeon.generate(g.world, level=g.world.map.level + 1)
-            else:
+            g.world.descend()
+            if g.world.victory:
                 WinScreen().run_modal()  # logic for the end of the game.
             g.states.pop()
             break
 
+    def cmd_up(self) -> None:
+        for obj in g.world.map.features:
+            if not (obj.x == g.world.player.x and obj.y == g.world.player.y):
+                continue
+            if not isinstance(obj, engine.features.StairsUp):
+                continue
+            g.world.ascend()
+            g.states.pop()
+            break
+
     def cmd_help(self) -> None:
         Help().run_modal()
 
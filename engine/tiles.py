@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import NamedTuple, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
 
 import numpy as np
 
@@ -22,8 +22,15 @@
 )
 
 
+TILE_ID = np.uint8
+"The dtype of tile ID arrays, such as `Map.tiles`."
+
+
 class Tile(NamedTuple):
-    """A NamedTuple type broadcastable to any TILE_DT array."""
+    """The properties of a tile type, one entry of `TILE_TABLE`.
+
+    Tiles are registered with `register` and maps only store their tile ID.
+    """
 
     move_cost: int
     fly_cost: int
@@ -33,59 +40,105 @@ class Tile(NamedTuple):
     dangerous: bool = False
     swim_cost: int = 0
 
-    def as_np(self) -> np.ndarray:
-        """Return this tile as an array scaler."""
-        return np.asarray(self, dtype=TILE_DT)
+
+TILES: List[Tile] = []
+"Every registered tile, indexed by tile ID."
+
+
+def register(tile: Tile) -> int:
+    """Register `tile` and return its new tile ID."""
+    TILES.append(tile)
+    assert len(TILES) <= np.iinfo(TILE_ID).max + 1, "Too many tiles for TILE_ID."
+    return len(TILES) - 1
 
 
 # Tiles color scheme:
 # https://paletton.com/#uid=7000H0kmOpCsM5UrxfxiMyhdzSk
-DEFAULT = WALL = Tile(
-    move_cost=0,
-    fly_cost=0,
-    transparent=False,
-    graphic=(ord(" "), (255, 255, 255), (47, 29, 5)),
+DEFAULT = WALL = register(
+    Tile(
+        move_cost=0,
+        fly_cost=0,
+        transparent=False,
+        graphic=(ord(" "), (255, 255, 255), (47, 29, 5)),
+    )
 )
-FLOOR = Tile(
-    move_cost=1,
-    fly_cost=1,
-    transparent=True,
-    graphic=(ord("."), (255, 190, 105), (124, 77, 17)),
+FLOOR = register(
+    Tile(
+        move_cost=1,
+        fly_cost=1,
+        transparent=True,
+        graphic=(ord("."), (255, 190, 105), (124, 77, 17)),
+    )
 )
-RUBBLE = Tile(
-    move_cost=1,
-    fly_cost=1,
-    transparent=True,
-    graphic=(ord(","), (0, 0, 0), (124, 77, 17)),
+RUBBLE = register(
+    Tile(
+        move_cost=1,
+        fly_cost=1,
+        transparent=True,
+        graphic=(ord(","), (0, 0, 0), (124, 77, 17)),
+    )
 )
 
-WATER = Tile(
-    move_cost=0,
-    fly_cost=1,
-    swim_cost=1,
-    transparent=True,
-    graphic=(ord("~"), (139, 192, 230), (15, 52, 79)),
+WATER = register(
+    Tile(
+        move_cost=0,
+        fly_cost=1,
+        swim_cost=1,
+        transparent=True,
+        graphic=(ord("~"), (139, 192, 230), (15, 52, 79)),
+    )
 )
 
-ICE_FLOOR = Tile(
-    move_cost=1,
-    fly_cost=1,
-    transparent=True,
-    graphic=(ord("+"), (0xFF, 0xFF, 0xFF), (77, 131, 170)),
+ICE_FLOOR = register(
+    Tile(
+        move_cost=1,
+        fly_cost=1,
+        transparent=True,
+        graphic=(ord("+"), (0xFF, 0xFF, 0xFF), (77, 131, 170)),
+    )
 )
-ICE_WALL = Tile(
-    move_cost=0,
-    fly_cost=0,
-    transparent=True,
-    graphic=(ord("="), (0xFF, 0xFF, 0xFF), (77, 131, 170)),
+ICE_WALL = register(
+    Tile(
+        move_cost=0,
+        fly_cost=0,
+        transparent=True,
+        graphic=(ord("="), (0xFF, 0xFF, 0xFF), (77, 131, 170)),
+    )
 )
 
-ACID = Tile(
-    move_cost=1,
-    fly_cost=1,
-    swim_cost=1,
-    transparent=True,
-    graphic=(ord("°"), (0xFF, 0xFF, 0xFF), (86, 208, 86)),
-    effect=Effect(power=1),
-    dangerous=True,
+ACID = register(
+    Tile(
+        move_cost=1,
+        fly_cost=1,
+        swim_cost=1,
+        transparent=True,
+        graphic=(ord("°"), (0xFF, 0xFF, 0xFF), (86, 208, 86)),
+        effect=engine.effects.Corrode(power=1),
+        dangerous=True,
+    )
 )
+
+TILE_TABLE: np.ndarray = np.array(TILES, dtype=TILE_DT)
+"The properties of every tile indexed by tile ID.  Index this with a tile ID array to get a property of a map."
+
+TRANSFORMS: Dict[Type[Effect], Dict[int, int]] = {
+    engine.effects.Cold: {WATER: ICE_FLOOR, ACID: ICE_FLOOR},
+    engine.effects.Heat: {ICE_FLOOR: WATER, ICE_WALL: WATER},
+    engine.effects.PlaceAcid: {tile_id: ACID for tile_id in range(len(TILES))},
+    engine.effects.Dig: {WALL: RUBBLE, ICE_WALL: ICE_FLOOR},
+}
+"Tile transformation rules for each effect type.  {effect_type: {source_tile: result_tile}}"
+
+
+def make_transform_table(rules: Dict[int, int]) -> np.ndarray:
+    """Return a lookup table which maps every tile ID to its result from `rules`."""
+    table = np.arange(len(TILES), dtype=TILE_ID)
+    for source, result in rules.items():
+        table[source] = result
+    return table
+
+
+TRANSFORM_TABLES: Dict[Type[Effect], np.ndarray] = {
+    effect_type: make_transform_table(rules) for effect_type, rules in TRANSFORMS.items()
+}
+"Lookup tables made from `TRANSFORMS`, these can be indexed with a tile ID array to transform it."
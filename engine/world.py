@@ -1,24 +1,41 @@
 """World class module."""
 from __future__ import annotations
 
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
+import collections
+import concurrent.futures
 import logging
 import random
 
 import engine.actor
+import engine.animation
+import engine.events
+import engine.features
+import engine.log
 import engine.map
 import engine.spells
+import g
+import procgen.dungeon
 
 logger = logging.getLogger(__name__)
 
+ESCAPE_LEVEL = 4  # Descending to this level wins the game.
+MAX_LIVE_LEVELS = 3  # The active level and the most recently left levels are kept in memory as they are.
+MAX_FROZEN_LEVELS = 32  # Older snapshots are discarded, those levels are generated again if they're revisited.
+
+prefetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+"Generates levels in the background, shared by all worlds.  One level is generated at a time."
+
 
 class World:
     """This class is used to hold everything you'll want to save between sessions."""
 
     map: engine.map.Map
 
-    def __init__(self) -> None:
-        self.rng = random.Random()
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.seed = random.getrandbits(32) if seed is None else seed
+        "The seed of this world.  Each level is generated from this seed and the level number."
+        self.rng = random.Random(self.seed)
         self.spell_slots: List[Optional[engine.spells.Spell]] = [
             engine.spells.PlaceActor(name="Place bomb", cooldown=8, spawn=engine.actor.Bomb),
             engine.spells.Beam(name="Ice beam", cooldown=3, effect=engine.effects.Cold(power=2)),
@@ -32,8 +49,22 @@ def __init__(self) -> None:
             None,
         ]  # Spells equipped to the hotbar.
         assert len(self.spell_slots) == 10
-        self.log: List[str] = []  # Text log.
+        self.log = engine.log.MessageLog()  # Text log.
+        self.events = engine.events.EventQueue()  # Pending chain reactions.
         self.player = engine.actor.Player(0, 0)
+        self.player_controller: Optional[Callable[[engine.actor.Actor], engine.actions.Action]] = None
+        "If set then this makes the players actions instead of the player, such as `engine.actions.AutoPlay`."
+        self.turns = 0  # The number of turns the player has taken.
+        self.victory = False  # True once the player has escaped the dungeon.
+        self.stuck = False  # True once `engine.actions.AutoPlay` has nowhere left to go, this ends the game.
+        self.killed_by: Optional[str] = None  # The name of the actor or tile which killed the player.
+        self.prefetch: Optional[Tuple[int, concurrent.futures.Future[engine.map.Map]]] = None
+        "The (level, future) of the next level being generated in the background."
+        self.levels: collections.OrderedDict[int, engine.map.Map] = collections.OrderedDict()
+        "Levels kept in memory by level number, from the least to the most recently active."
+        self.frozen_levels: collections.OrderedDict[int, bytes] = collections.OrderedDict()
+        "Snapshots of levels evicted from `levels`, from `Map.freeze`, oldest first."
+        self.deepest_level = 0  # The deepest level the player has reached.
 
     def report(self, message: str, visual_xy: Optional[Tuple[int, int]] = None) -> None:
         """Append to the text log."""
@@ -42,33 +73,142 @@ def report(self, message: str, visual_xy: Optional[Tuple[int, int]] = None) -> N
         logger.info(message)
         self.log.append(message)
 
-    def loop(self) -> None:
-        while self.player in self.map.actors:
-            next_obj = self.map.schedule[0]
+    def cast_spell(self, spell: engine.spells.Spell, direction: Optional[Tuple[int, int]] = None) -> bool:
+        """Have the player cast `spell` and start its cooldown.  Returns True if the spell took a turn."""
+        if spell.cooldown_left:
+            self.report(f"{spell.name} is on cooldown!")
+            return False
+        self.report(f"You cast {spell.name}")
+        if not spell.cast(self.player, direction):
+            return False
+        spell.cooldown_left = spell.cooldown_length + 1
+        return True
+
+    def enter_map(self, map_: engine.map.Map, xy: Optional[Tuple[int, int]] = None) -> None:
+        """Move the player to `xy` of `map_` and make it the active map.
+
+        `xy` defaults to the start of the map.  The player is placed next to `xy` if something else is already there.
+        """
+        if hasattr(self, "map") and self.player in self.map.actors:
+            self.map.remove_actor(self.player)  # Remove player from the previous map.
+        self.player.x, self.player.y = map_.get_free_xy(*(xy or map_.start_xy), self.player)
+        map_.add_actor(self.player)
+        self.map = map_
+        self.deepest_level = max(self.deepest_level, map_.level)
+        self.keep_level(map_)
+
+    def keep_level(self, map_: engine.map.Map) -> None:
+        """Keep `map_` as the most recently active level.
+
+        Levels over `MAX_LIVE_LEVELS` are frozen into snapshots, and snapshots over `MAX_FROZEN_LEVELS` are dropped.
+        """
+        self.levels[map_.level] = map_
+        self.levels.move_to_end(map_.level)
+        self.frozen_levels.pop(map_.level, None)
+        while len(self.levels) > MAX_LIVE_LEVELS:
+            level, old_map = self.levels.popitem(last=False)
+            self.frozen_levels[level] = old_map.freeze()
+        while len(self.frozen_levels) > MAX_FROZEN_LEVELS:
+            self.frozen_levels.popitem(last=False)
+
+    def prefetch_next_level(self) -> None:
+        """Start generating the level below the current map in the background, if it isn't already."""
+        level = self.map.level + 1
+        if level == ESCAPE_LEVEL or (self.prefetch is not None and self.prefetch[0] == level):
+            return
+        if level in self.levels or level in self.frozen_levels:
+            return  # Already visited.
+        self.discard_prefetch()
+        self.prefetch = level, prefetch_executor.submit(procgen.dungeon.generate_level, level, self.seed)
+
+    def discard_prefetch(self) -> None:
+        """Cancel the level being generated in the background, or wait for it to finish if it already started."""
+        if self.prefetch is not None:
+            if not self.prefetch[1].cancel():
+                concurrent.futures.wait([self.prefetch[1]])
+            self.prefetch = None
+
+    def get_level(self, level: int) -> engine.map.Map:
+        """Return the map for `level`, thawing it if it was frozen or generating it if it hasn't been visited."""
+        if level in self.levels:
+            return self.levels[level]
+        if level in self.frozen_levels:
+            return engine.map.Map.thaw(self.frozen_levels.pop(level))
+        return self.new_level(level)
+
+    def new_level(self, level: int) -> engine.map.Map:
+        """Return a new map for `level`, using the prefetched map if there is one.
+
+        If the prefetch hasn't started yet then the map is generated here instead.  If it's still running then this
+        waits for it, and if it failed then the map is generated again here.
+        """
+        prefetch, self.prefetch = self.prefetch, None
+        if prefetch is not None and prefetch[0] == level and not prefetch[1].cancel():
+            try:
+                return prefetch[1].result()
+            except Exception:
+                logger.exception(f"Prefetching level {level} failed, generating it again.")
+        return procgen.dungeon.generate_level(level, self.seed, debug=True)
+
+    def descend(self) -> None:
+        """Move the player to the next dungeon level, or win the game if this was the last level.
+
+        The player is healed when reaching a level for the first time.
+        """
+        level = self.map.level + 1
+        if level > self.deepest_level:
+            self.player.hp = 12
+        if level != ESCAPE_LEVEL:
+            self.map.remove_actor(self.player)  # Leave this map before the next level is loaded or generated.
+            self.enter_map(self.get_level(level))
+        else:
+            self.victory = True
+
+    def ascend(self) -> None:
+        """Move the player to the down stairs of the previous dungeon level."""
+        self.map.remove_actor(self.player)  # Leave this map before the previous level is loaded or thawed.
+        map_ = self.get_level(self.map.level - 1)
+        stairs = [(obj.x, obj.y) for obj in map_.features if isinstance(obj, engine.features.StairsDown)]
+        self.enter_map(map_, stairs[0] if stairs else None)
+
+    def loop(self, max_turns: Optional[int] = None) -> None:
+        """Run the game until the player dies or wins, or until the player has taken `max_turns` turns."""
+        while self.player in self.map.actors and not self.victory and not self.stuck:
+            if max_turns is not None and self.turns >= max_turns:
+                return
+            next_obj = self.map.schedule.peek()
             if next_obj is self.player:
                 self.map.reveal(self.player.get_fov())  # Player remembers visible tiles.
-            if next_obj.skip_turns == 0:
-                try:
-                    next_obj.on_turn()
-                except engine.actions.StopAction as exc:
-                    if isinstance(next_obj, engine.actor.Actor):
-                        next_obj.ai = None
-                    if self.player is next_obj:
-                        self.report(exc.args[0])
-                        continue  # Start over and call next_obj.on_turn again.
-            else:
-                next_obj.skip_turns -= 1
-            if self.map.schedule and self.map.schedule[0] is next_obj:
-                self.map.schedule.rotate(1)
+                self.prefetch_next_level()
+                engine.animation.queue.flush()  # Show everything which happened since the players last turn.
+            engine.animation.clear_base_frame()
+            engine.animation.queue.start_sequence(deferring=next_obj is not self.player)
+            try:
+                next_obj.on_turn()
+            except engine.actions.StopAction as exc:
+                if isinstance(next_obj, engine.actor.Actor):
+                    next_obj.ai = None
+                if self.player is next_obj:
+                    self.report(exc.args[0])
+                    continue  # Start over and call next_obj.on_turn again.
+            if next_obj in self.map.schedule and self.map.schedule.peek() is next_obj:
+                # Skipped turns are handled with a single reschedule.
+                self.map.schedule.reschedule(next_obj, 1 + next_obj.skip_turns)
+                next_obj.skip_turns = 0
                 # All end-of-turn effects.
                 if isinstance(next_obj, engine.actor.Actor):
                     next_obj.on_end_turn()
                 if next_obj is self.player:
                     # End of player's turn.
+                    self.turns += 1
                     for spell in self.spell_slots:
                         if spell is None:
                             continue
                         if spell.cooldown_left:
                             spell.cooldown_left -= 1
+        engine.animation.queue.flush()
+        if self.victory or self.stuck:
+            return
         self.report("You have died.  Press escape to start over.")
-        engine.states.KillScreen().run_modal()
+        if not g.headless:
+            engine.states.KillScreen().run_modal()
@@ -4,17 +4,22 @@
 """
 from __future__ import annotations
 
-from typing import List
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 
 import tcod
 
-import engine.state
-import engine.world
+if TYPE_CHECKING:
+    import engine.state
+    import engine.world
 
 context: tcod.context.Context  # The active context.
+console: Optional[tcod.console.Console] = None  # The console reused for every frame, see engine.state.get_console.
 states: List[engine.state.State] = []  # A stack of states, with the last item being the active state.
 world: engine.world.World  # The active world.
 
+headless: bool = False  # If True then nothing is rendered or presented and `context` is never used.
+base_frame: Optional[Tuple[Any, tcod.console.Console]] = None  # (cache_key, console) used by engine.animation.
+
 debug_dungeon_generation: bool = __debug__  # Visualize the dungeon being generated.
 debug_fullbright: bool = False
 debug_rendering: bool = False  # Highlight areas which have not been drawn over.
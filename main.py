@@ -5,6 +5,7 @@
 """
 from __future__ import annotations  # This may be required to resolve import order issues.
 
+import argparse
 import logging
 import os
 import sys
@@ -13,13 +14,32 @@
 import tcod
 
 from constants import SCREEN_HEIGHT, SCREEN_WIDTH
+import engine.headless
 import engine.world
 import g
+import procgen.cache
 import procgen.dungeon
 
 
 def main() -> None:
     """Main entrypoint."""
+    parser = argparse.ArgumentParser(description="RayWizard")
+    parser.add_argument(
+        "--headless", type=int, metavar="TURNS", help="Play automatically without a display for up to TURNS turns."
+    )
+    parser.add_argument(
+        "--level-cache",
+        nargs="?",
+        const="level_cache",
+        metavar="DIR",
+        help="Save generated levels to DIR and load them instead of generating them again.",
+    )
+    args = parser.parse_args()
+    procgen.cache.cache_dir = args.level_cache
+    if args.headless is not None:
+        engine.headless.play(max_turns=args.headless)
+        return
+
     tileset = tcod.tileset.load_tilesheet("Alloy_curses_12x12.png", 16, 16, tcod.tileset.CHARMAP_CP437)
     with tcod.context.new(width=SCREEN_WIDTH, height=SCREEN_HEIGHT, tileset=tileset, title="RayWizard") as g.context:
         level = 1
@@ -0,0 +1,82 @@
+"""On-disk cache of generated levels.
+
+Levels are generated from a world seed, so a level with the same seed, level number, and size is always the same.
+Instead of generating it again it can be loaded from a small compressed NumPy archive.
+"""
+from __future__ import annotations
+
+from typing import Optional
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+import engine.actor
+import engine.features
+import engine.map
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2  # Increment this when the generator changes so that older cached levels are ignored.
+
+cache_dir: Optional[str] = None  # The directory to cache levels in.  The cache is disabled if this is None.
+
+
+def get_path(seed: int, level: int, width: int, height: int, room_max_size: int) -> Optional[str]:
+    """Return the cache file path for a generated level, or None if the cache is disabled."""
+    if cache_dir is None:
+        return None
+    return os.path.join(cache_dir, f"v{CACHE_VERSION}-{seed}-{level}-{width}x{height}-{room_max_size}.npz")
+
+
+def save(path: str, gamemap: engine.map.Map) -> None:
+    """Save a newly generated map to `path`.
+
+    Only what the generator creates is saved: the tiles, actor and feature types and positions, and the start
+    position.  The file is written to a temporary file first so that other processes never load a partial file.
+    Errors are logged and otherwise ignored, the level will be generated again next time.
+    """
+    actors = list(gamemap.actor_handles.values())  # In the order they were added.
+    features = list(gamemap.features)
+    temp_path: Optional[str] = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".npz", delete=False) as file:
+            temp_path = file.name
+            np.savez_compressed(
+                file,
+                level=gamemap.level,
+                tiles=gamemap.tiles,
+                start_xy=gamemap.start_xy,
+                actor_types=np.array([type(actor).__name__ for actor in actors], dtype=str),
+                actor_xy=np.array([actor.xy for actor in actors], dtype=np.int32).reshape(-1, 2),
+                feature_types=np.array([type(feature).__name__ for feature in features], dtype=str),
+                feature_xy=np.array([(feature.x, feature.y) for feature in features], dtype=np.int32).reshape(-1, 2),
+            )
+        os.replace(temp_path, path)
+    except Exception:
+        logger.exception(f"Failed to save level {path} to the cache.")
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load(path: str) -> Optional[engine.map.Map]:
+    """Return the map saved at `path`, or None if it isn't cached or couldn't be loaded."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            width, height = data["tiles"].shape
+            gamemap = engine.map.Map(width, height, level=int(data["level"]))
+            gamemap.set_tiles(..., data["tiles"])
+            start_x, start_y = data["start_xy"].tolist()
+            gamemap.start_xy = start_x, start_y
+            for name, (x, y) in zip(data["actor_types"].tolist(), data["actor_xy"].tolist()):
+                gamemap.add_actor(getattr(engine.actor, name)(x, y))
+            for name, (x, y) in zip(data["feature_types"].tolist(), data["feature_xy"].tolist()):
+                gamemap.add_feature(getattr(engine.features, name)(x, y))
+    except Exception:
+        logger.exception(f"Failed to load cached level {path}, it will be generated again.")
+        return None
+    return gamemap
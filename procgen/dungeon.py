@@ -14,6 +14,7 @@
 import engine.rendering
 import engine.tiles
 import engine.world
+import procgen.cache
 
 
 class Room:
@@ -77,7 +78,7 @@ def convolve(tiles: np.ndarray, wall_rule: int = 5) -> np.ndarray:
     return neighbors < wall_rule  # type: ignore  # Apply the wall rule.
 
 
-def create_noise_map(width: int, height: int, wall_percent: int) -> np.ndarray:
+def create_noise_map(width: int, height: int, wall_percent: int, np_rng: np.random.Generator) -> np.ndarray:
     """Creates a map of unifrom random noise to feed into cave and water generators.
 
     We could use a frequency base noise generator if we want to have features of a particular general size.
@@ -86,7 +87,7 @@ def create_noise_map(width: int, height: int, wall_percent: int) -> np.ndarray:
     `wall_percent` is an integer which represents what portion out 100 should be spawned with walls.
     Walls are False in output.
     """
-    return np.random.random((height, width)).transpose() < wall_percent / 100  # type: ignore
+    return np_rng.random((height, width)).transpose() < wall_percent / 100  # type: ignore
 
 
 def generate(
@@ -96,7 +97,61 @@ def generate(
     height: int = 45,
     room_max_size: int = 20,
 ) -> engine.map.Map:
-    """Return a randomly generated GameMap."""
+    """Return the GameMap for `level` of the world `model`, with the player of `model` moved into it."""
+    gm = generate_level(level, model.seed, width, height, room_max_size, debug=True)
+    model.enter_map(gm)
+    engine.rendering.debug_map(gm)
+    return gm
+
+
+def get_level_rngs(seed: int, level: int) -> Tuple[random.Random, np.random.Generator]:
+    """Return the random streams used to generate `level` of the world with `seed`.
+
+    Each level has its own streams, so a level is the same no matter when or in which order it's generated.
+    """
+    seed_sequence = np.random.SeedSequence([seed, level])
+    return random.Random(int(seed_sequence.generate_state(1)[0])), np.random.default_rng(seed_sequence)
+
+
+def generate_level(
+    level: int,
+    seed: int,
+    width: int = 80,
+    height: int = 45,
+    room_max_size: int = 20,
+    debug: bool = False,
+) -> engine.map.Map:
+    """Return the GameMap for `level` of the world with `seed`, without the player.
+
+    The map is loaded from `procgen.cache` if it's enabled and has this level, otherwise the map is generated and
+    then added to the cache.
+    """
+    cache_path = procgen.cache.get_path(seed, level, width, height, room_max_size)
+    if cache_path is not None:
+        gm = procgen.cache.load(cache_path)
+        if gm is not None:
+            return gm
+    gm = build_level(level, seed, width, height, room_max_size, debug)
+    if cache_path is not None:
+        procgen.cache.save(cache_path, gm)
+    return gm
+
+
+def build_level(
+    level: int,
+    seed: int,
+    width: int = 80,
+    height: int = 45,
+    room_max_size: int = 20,
+    debug: bool = False,
+) -> engine.map.Map:
+    """Return a newly generated GameMap without the player.
+
+    The position where the player should start is stored in `Map.start_xy`.  This doesn't touch the active world, so
+    it can be run on a background thread.  If `debug` is True then each step is shown with `debug_map`, which must
+    only be done from the main thread.
+    """
+    rng, np_rng = get_level_rngs(seed, level)
     wallType = engine.tiles.WALL
     waterType = engine.tiles.WATER
 
@@ -110,27 +165,29 @@ def generate(
     max_rooms = 100
 
     gm = engine.map.Map(width, height, level=level)
-    gm.tiles[...] = wallType
-    engine.rendering.debug_map(gm)
+    gm.set_tiles(..., wallType)
+    if debug:
+        engine.rendering.debug_map(gm)
     rooms: List[Room] = []
 
     for _ in range(max_rooms):
         # random width and height
-        w = random.randint(room_min_size, room_max_size)
-        h = random.randint(room_min_size, room_max_size)
+        w = rng.randint(room_min_size, room_max_size)
+        h = rng.randint(room_min_size, room_max_size)
         # random position without going out of the boundaries of the map
-        x = random.randint(0, width - w)
-        y = random.randint(0, height - h)
+        x = rng.randint(0, width - w)
+        y = rng.randint(0, height - h)
         new_room = Room(x, y, w, h)
         if any(new_room.intersects(other) for other in rooms):
             continue  # This room intersects with a previous room.
 
         # Mark room inner area as open.
-        gm.tiles[new_room.inner] = engine.tiles.FLOOR
-        engine.rendering.debug_map(gm)
+        gm.set_tiles(new_room.inner, engine.tiles.FLOOR)
+        if debug:
+            engine.rendering.debug_map(gm)
         if rooms:
             # Open a tunnel between rooms.
-            if random.randint(0, 99) < 80:
+            if rng.randint(0, 99) < 80:
                 # 80% of tunnels are to the nearest room.
                 other_room = min(rooms, key=new_room.distance_to)
                 # close_rooom = True
@@ -140,7 +197,7 @@ def generate(
                 # close_rooom = False
             t_start = new_room.center
             t_end = other_room.center
-            if random.randint(0, 1):
+            if rng.randint(0, 1):
                 t_middle = t_start[0], t_end[1]
             else:
                 t_middle = t_end[0], t_start[1]
@@ -149,30 +206,32 @@ def generate(
             ].transpose()  # tunnel_indices[axis, index]
             if level != 2:  # makes Ice level have 1 wide walls.
                 tunnel_indices = np.append(tunnel_indices, tunnel_indices - 1, axis=1)  # Make tunnels 2 wide.
-            gm.tiles[tuple(tunnel_indices)] = engine.tiles.FLOOR
-            engine.rendering.debug_map(gm)
+            gm.set_tiles(tuple(tunnel_indices), engine.tiles.FLOOR)
+            if debug:
+                engine.rendering.debug_map(gm)
         rooms.append(new_room)
 
     # Start of Water generation:
     # step 1 make random map noise:
     if level != 3:
-        randomMap = create_noise_map(width, height, 80)
+        randomMap = create_noise_map(width, height, 80, np_rng)
     else:
-        randomMap = create_noise_map(width, height, 70)
+        randomMap = create_noise_map(width, height, 70, np_rng)
 
     # step 2: feed to cellular automata several times (number of times based on tweaking.
     automataMap1 = convolve(randomMap, 10)  # second value is the number of nearby tiles needed to be water.
 
     # step 3: Use map to replace wall and floor tiles with water.
-    gm.tiles[~automataMap1] = waterType
-    engine.rendering.debug_map(gm)
+    gm.set_tiles(~automataMap1, waterType)
+    if debug:
+        engine.rendering.debug_map(gm)
 
     # Add actors to rooms.
     for room in rooms[1:-1]:
-        if random.randint(0, 1):
+        if rng.randint(0, 1):
             # gm.add_actor(engine.actor.Actor(*room.center)) #placeholder enemies.
             if level == 1:  # Acid level
-                if random.randint(0, 1):
+                if rng.randint(0, 1):
                     gm.add_actor(engine.actor.AcidBoltEnemy(*room.center))
                 else:
                     gm.add_actor(engine.actor.HeatBoltEnemy(*room.center))
@@ -180,17 +239,17 @@ def generate(
                 gm.add_actor(engine.actor.ColdBoltEnemy(*room.center))
         else:
             gm.add_actor(engine.actor.HunterEnemy(*room.center))
-        engine.rendering.debug_map(gm)
+        if debug:
+            engine.rendering.debug_map(gm)
 
-    # Add player to the first room.
-    if hasattr(model, "map") and model.player in model.map.actors:
-        model.map.remove_actor(model.player)  # Remove player from the previous map.
-    model.player.x, model.player.y = rooms[0].center
-    gm.add_actor(model.player)
-    engine.rendering.debug_map(gm)
+    # The player starts in the first room, which has the stairs back up.
+    gm.start_xy = rooms[0].center
+    if level > 1:
+        gm.add_feature(engine.features.StairsUp(*gm.start_xy))
 
     gm.add_feature(engine.features.StairsDown(*rooms[-1].center))
-    gm.tiles[rooms[-1].center] = engine.tiles.FLOOR
-    engine.rendering.debug_map(gm)
+    gm.set_tiles(rooms[-1].center, engine.tiles.FLOOR)
+    if debug:
+        engine.rendering.debug_map(gm)
 
     return gm
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Monte Carlo simulation script.
+
+Plays many seeded games without a display across a process pool and reports their statistics.
+This is used to tune spells and enemies.
+"""
+from __future__ import annotations  # This may be required to resolve import order issues.
+
+from typing import Counter, List
+import argparse
+import collections
+import concurrent.futures
+import functools
+import statistics
+import sys
+import time
+import warnings
+
+import engine.headless
+
+
+def main() -> None:
+    """Simulation entrypoint."""
+    parser = argparse.ArgumentParser(description="Play many RayWizard games automatically and report the results.")
+    parser.add_argument("--games", type=int, default=100, help="The number of games to play.")
+    parser.add_argument("--turns", type=int, default=2000, help="The maximum number of turns for each game.")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the first game, each game adds one to this.")
+    parser.add_argument("--workers", type=int, default=None, help="The number of worker processes.")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    seeds = range(args.seed, args.seed + args.games)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results: List[engine.headless.GameStats] = list(
+            executor.map(functools.partial(engine.headless.play_seeded, max_turns=args.turns), seeds)
+        )
+    elapsed = time.perf_counter() - start_time
+
+    deaths: Counter[str] = collections.Counter(result.killed_by for result in results if result.killed_by)
+    levels: Counter[int] = collections.Counter(result.deepest_level for result in results)
+    print(f"Played {len(results)} games in {elapsed:.1f} seconds.")
+    print(f"Turns survived: mean {statistics.mean(r.turns for r in results):.1f}, ", end="")
+    print(f"median {statistics.median(r.turns for r in results):.1f}")
+    print(f"Mean game time: {statistics.mean(r.wall_time for r in results):.2f} seconds")
+    print(f"Victories: {sum(r.victory for r in results)}")
+    print(f"Stuck: {sum(r.stuck for r in results)}")
+    print("Deepest level reached:")
+    for level, count in sorted(levels.items()):
+        print(f"  {level}: {count}")
+    print("Deaths by cause:")
+    for name, count in deaths.most_common():
+        print(f"  {name}: {count}")
+
+
+if __name__ == "__main__":
+    if not sys.warnoptions:
+        warnings.simplefilter("ignore")  # Worker processes would otherwise repeat the same warnings for every game.
+    main()